@@ -0,0 +1,44 @@
+'''Batch of operations: handler per operation vs BaseProcessor.batch.
+
+    python benchmarks/batch.py [operations]
+'''
+import sys
+import time
+
+from omfitt import BaseFixture, BaseProcessor, FixtureService
+
+
+class Fixture(BaseFixture):
+    def take_on(self, app_ctx, ctx):
+        ctx.shared_data[self] = 1
+
+    def on_output(self, app_ctx, ctx):
+        pass
+
+    def on_finalize(self, app_ctx, ctx):
+        pass
+
+
+def main(operations=200):
+    BaseFixture.__init_request_ctx__()
+    proc = BaseProcessor()
+    fs = FixtureService()
+    fixtures = [Fixture() for _ in range(5)]
+    h = proc.make_core_handler(
+        lambda i: i, None, fs, fixtures, {}, {'app_ctx': {}, 'staff_ctx': {}}
+    )
+    calls = [(h, (i,)) for i in range(operations)]
+    for name, run in [
+        ('handler per operation', lambda: [h(i) for i in range(operations)]),
+        ('BaseProcessor.batch', lambda: proc.batch(calls)),
+    ]:
+        best = float('inf')
+        for _ in range(5):
+            t0 = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - t0)
+        print(f'{name:>24}: {best * 1e3:7.2f} ms / {operations} operations')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,70 @@
+'''RouteContext per request vs BaseProcessor(ctx_pool=...).
+
+    python benchmarks/ctx_pool.py [number]
+
+allocations/request - memory blocks allocated by the request path (the route copy,
+RouteContext and its containers, fixture service locals ...) and still alive when
+the core function is called, traced with tracemalloc.
+'''
+import gc
+import sys
+import timeit
+import tracemalloc
+
+import omfitt
+from omfitt import BaseFixture, BaseProcessor, FixtureService
+
+
+class Fixture(BaseFixture):
+    def take_on(self, app_ctx, ctx):
+        pass
+
+
+# tracemalloc snapshot taken in the core function
+SNAPSHOTS = []
+
+
+def core(trace=False):
+    trace and SNAPSHOTS.append(tracemalloc.take_snapshot())
+    return 'ok'
+
+
+def make_handler(ctx_pool):
+    return BaseProcessor(ctx_pool=ctx_pool).make_core_handler(
+        core, None, FixtureService(), [Fixture() for _ in range(3)], {},
+        {'app_ctx': {}, 'staff_ctx': {}}
+    )
+
+
+def count_allocations(h, number):
+    '''Return blocks allocated by omfitt per request, alive at the core call.'''
+    only_omfitt = [tracemalloc.Filter(True, omfitt.__file__)]
+    tracemalloc.start()
+    gc.disable()
+    try:
+        h(True)
+        total = 0
+        for _ in range(number):
+            SNAPSHOTS.clear()
+            before = tracemalloc.take_snapshot().filter_traces(only_omfitt)
+            h(True)
+            stats = SNAPSHOTS[0].filter_traces(only_omfitt).compare_to(before, 'lineno')
+            total += sum(st.count_diff for st in stats if st.count_diff > 0)
+    finally:
+        gc.enable()
+        tracemalloc.stop()
+    return total / number
+
+
+def main(number=20000):
+    BaseFixture.__init_request_ctx__()
+    for name, ctx_pool in [('no pool', 0), ('ctx_pool=4', 4)]:
+        h = make_handler(ctx_pool)
+        h()
+        allocations = count_allocations(h, min(number, 200))
+        best = min(timeit.repeat(h, number=number, repeat=5))
+        print(f'{name:>12}: {best / number * 1e6:6.2f} us/request, {allocations:.2f} allocations/request')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,54 @@
+'''Memory footprint of 10k tenant fixtures: BaseFixture vs SlottedFixture.
+
+    python benchmarks/fixture_memory.py [count]
+'''
+import sys
+import time
+import tracemalloc
+
+from omfitt import BaseFixture, SlottedFixture
+
+
+class Holder(BaseFixture):
+    def __init__(self, tenant, db):
+        self.tenant = tenant
+        self.db = db
+
+
+class SlottedHolder(SlottedFixture):
+    __slots__ = ('tenant', 'db')
+
+    def __init__(self, tenant, db):
+        self.tenant = tenant
+        self.db = db
+
+
+def measure(cls, db, count):
+    tenants = [f'tenant-{i}' for i in range(count)]
+    elapsed = None
+    for _ in range(5):
+        t0 = time.perf_counter()
+        fixtures = [cls(t, db) for t in tenants]
+        elapsed = min(elapsed or 1e9, time.perf_counter() - t0)
+        del fixtures
+    tracemalloc.start()
+    fixtures = [cls(t, db) for t in tenants]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert [*fixtures[0].with_deps] == [db, fixtures[0]]
+    return size, elapsed
+
+
+def main(count=10000):
+    db = BaseFixture()
+    print(f'{count} fixtures')
+    for cls in (Holder, SlottedHolder):
+        size, elapsed = measure(cls, db, count)
+        print(
+            f'{cls.__bases__[0].__name__:>15}: {size / 1024:9.1f} KiB '
+            f'({size / count:6.1f} B/fixture), {elapsed * 1e6 / count:5.2f} us/fixture (best of 5)'
+        )
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
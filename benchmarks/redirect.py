@@ -0,0 +1,60 @@
+'''Redirect path: exception + Fitter.error handler vs ShortCircuit.
+
+    python benchmarks/redirect.py [number]
+'''
+import sys
+import timeit
+
+from omfitt import BaseFixture, BaseProcessor, FixtureService, ShortCircuit
+
+
+class Fixture(BaseFixture):
+    def take_on(self, app_ctx, ctx):
+        pass
+
+
+class Redirect(Exception):
+    def __init__(self, url):
+        super().__init__(url)
+        self.url = url
+
+
+REDIRECT = ShortCircuit('/login')
+
+
+def make_handler(core, handlers=None):
+    return BaseProcessor().make_core_handler(
+        core, None, FixtureService(), [Fixture() for _ in range(3)], {},
+        {'app_ctx': {}, 'staff_ctx': {}}, handlers
+    )
+
+
+def raise_redirect():
+    raise Redirect('/login')
+
+
+def raise_short_circuit():
+    raise ShortCircuit('/login')
+
+
+def return_short_circuit():
+    return REDIRECT
+
+
+def main(number=20000):
+    BaseFixture.__init_request_ctx__()
+    cases = {
+        'raise Redirect + error handler': make_handler(
+            raise_redirect, {Redirect: lambda app_ctx, ctx, ex: ex.url}
+        ),
+        'raise ShortCircuit': make_handler(raise_short_circuit),
+        'return ShortCircuit': make_handler(return_short_circuit),
+    }
+    for name, h in cases.items():
+        assert h() == '/login'
+        best = min(timeit.repeat(h, number=number, repeat=5))
+        print(f'{name:>32}: {best / number * 1e6:6.2f} us/request')
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -1,8 +1,12 @@
 import threading
+import weakref
 import functools
 import enum
 import inspect
-from collections import UserDict
+import time
+import concurrent.futures
+import sys
+from collections import UserDict, namedtuple
 from types import SimpleNamespace
 
 __version__ = '0.0.1'
@@ -27,12 +31,20 @@ class ProcessPhase(str, enum.Enum):
     FINALIZE = 'finalize'
 
 
+RouteKey = namedtuple('RouteKey', 'app name')
+
+
+class DeadlineExceeded(Exception):
+    ''' Request time budget is exhausted (see RouteContext.deadline).'''
+    status = 504
+
+
 class RouteContext:
     __slots__ = (
         'request', 'response', 'output', 'shared_data',
         'exception', 'finalize_exceptions',
         'successful', 'phase', 'stop_finalize',
-        'app_ctx', '_provided'
+        'app_ctx', '_provided', 'route', 'deadline'
     )
 
     def __init__(self):
@@ -47,6 +59,28 @@ class RouteContext:
         self.stop_finalize = False
         self.app_ctx = {}
         self._provided = {}
+        self.route: RouteKey = None
+        # time.monotonic() based
+        self.deadline: float = None
+
+    def reset(self):
+        ''' Prepare the context for reuse (see BaseProcessor(ctx_pool=...)),
+            containers are cleared in place (the pool doesn't reuse a context
+            whose containers are referenced elsewhere).
+        '''
+        self.request = None
+        self.response = None
+        self.output = None
+        self.shared_data.clear()
+        self.exception = None
+        self.finalize_exceptions.clear()
+        self.successful = True
+        self.phase = None
+        self.stop_finalize = False
+        self.app_ctx.clear()
+        self._provided.clear()
+        self.route = None
+        self.deadline = None
 
     def provide(self, key, obj):
         if key in self._provided:
@@ -56,8 +90,27 @@ class RouteContext:
     def ask(self, key, default=None):
         return self._provided.get(key, default)
 
+    def set_timeout(self, seconds):
+        ''' Set the deadline in `seconds` from now, an earlier deadline is kept.'''
+        deadline = time.monotonic() + seconds
+        if self.deadline is None or deadline < self.deadline:
+            self.deadline = deadline
+
+    def remaining(self):
+        ''' Return the remaining time budget in seconds (None - unlimited),
+            e.g. to set I/O timeouts.
+        '''
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check_deadline(self):
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            raise DeadlineExceeded('Request deadline exceeded')
+
 
 class LocalStorage:
+    __slots__ = ()
     __request_master_ctx__ = threading.local()
 
     @property
@@ -87,29 +140,84 @@ class LocalStorage:
 
 
 class BaseGateway(LocalStorage):
-    def setup(self, app_ctx):
+    def setup(self, app_ctx, route_ctx):
         pass
 
     def cleanup(self, app_ctx, route_ctx):
         pass
 
 
+class GatewayChain(BaseGateway):
+    ''' Setup gateways in order, cleanup in reverse order.
+
+        If setup of some gateway fails, the already set up ones are cleaned up.
+    '''
+
+    def __init__(self, *gateways):
+        self.gateways = gateways
+
+    def setup(self, app_ctx, route_ctx):
+        done = []
+        try:
+            for g in self.gateways:
+                g.setup(app_ctx, route_ctx)
+                done.append(g)
+        except BaseException:
+            self._cleanup(done, app_ctx, route_ctx)
+            raise
+
+    def cleanup(self, app_ctx, route_ctx):
+        self._cleanup(self.gateways, app_ctx, route_ctx)
+
+    @staticmethod
+    def _cleanup(gateways, app_ctx, route_ctx):
+        error = None
+        for g in reversed(gateways):
+            try:
+                g.cleanup(app_ctx, route_ctx)
+            except Exception as ex:
+                error = error or ex
+        if error is not None:
+            raise error
+
+
 class BaseFixture(LocalStorage):
+    # no slots of its own: subclasses keep __prerequisites__ in the instance
+    # __dict__ and can be mixed with dict, list or Exception
+    __slots__ = ()
     __track_deps_if_instance__ = []
+    # {id(track_list): (len(track_list), tuple(track_list))}
+    __track_types_cache__ = {}
 
     def __new__(cls, *args, **kwargs):
+        if cls is BaseFixture:
+            cls = _PlainFixture
         self = super().__new__(cls)
-        deps = self.__prerequisites__ = []
-        track_classes = cls.__track_deps_if_instance__
-        if deps is not None:
-            for it in [*args, *kwargs.values()]:
-                if (
-                    isinstance(it, tuple(track_classes))
-                    and it not in deps
-                ):
-                    deps.append(it)
+        self.__prerequisites__ = cls._track_deps(args, kwargs)
         return self
 
+    @classmethod
+    def _track_deps(cls, args, kwargs):
+        track = cls.__track_deps_if_instance__
+        cache = BaseFixture.__track_types_cache__
+        cached = cache.get(id(track))
+        if cached is None or cached[0] != len(track):
+            cached = cache[id(track)] = (len(track), tuple(track))
+        track_types = cached[1]
+        deps = []
+        for it in (args if not kwargs else (*args, *kwargs.values())):
+            if isinstance(it, track_types) and it not in deps:
+                deps.append(it)
+        return deps
+
+    def warmup(self, app_ctx):
+        ''' Called once at mount-time (see Fitter.warmup_fixtures)
+            to prepare pools, clients, caches etc.
+
+            Can be called concurrently with other fixtures warmup.
+        '''
+        pass
+
     def take_on(self, app_ctx, ctx):
         ''' Called before run or before direct use of the fixture.
 
@@ -164,6 +272,34 @@ class BaseFixture(LocalStorage):
 BaseFixture.__track_deps_if_instance__.append(BaseFixture)
 
 
+class _PlainFixture(BaseFixture):
+    ''' What `BaseFixture()` builds: BaseFixture itself has no instance __dict__. '''
+
+
+class SlottedFixture(BaseFixture):
+    ''' Lightweight fixture base for mass deployments:
+        no instance __dict__, dependencies are kept in a tuple.
+
+        Subclasses must declare `__slots__` for their own attributes:
+
+        class TenantDB(SlottedFixture):
+            __slots__ = ('dsn',)
+    '''
+    __slots__ = ('__prerequisites__',)
+
+    def __new__(cls, *args, **kwargs):
+        self = object.__new__(cls)
+        self.__prerequisites__ = tuple(cls._track_deps(args, kwargs))
+        return self
+
+    def use_fixtures(self, *fixtures):
+        deps = self.__prerequisites__
+        self.__prerequisites__ = deps + tuple(f for f in fixtures if f not in deps)
+        if len(fixtures) == 1:
+            return fixtures[0]
+        return fixtures
+
+
 class FixtureStorage(UserDict):
     def __init__(self, fixtures_dict=None):
         super().__init__()
@@ -215,6 +351,8 @@ class FixtureShop:
         this = self._local.this = SimpleNamespace()
         this.opened = True
         this.backdoor_opened = False
+        # {name: fixture} - already checked out in the request
+        this.checked_out = {}
         if fixtures is None:
             # we are in loading mode (action.uses())
             fixtures = self._init_fixtures
@@ -222,7 +360,9 @@ class FixtureShop:
         return self
 
     def close(self):
-        self._local.this.opened = False
+        this = self._local.this
+        this.opened = False
+        this.checked_out = {}
 
     def open_backdoor(self):
         self._local.this.backdoor_opened = True
@@ -235,11 +375,17 @@ class FixtureShop:
 
     def __getattr__(self, k):
         this = self._local.this
+        try:
+            # the fixture (and its deps) is already involved
+            return this.checked_out[k]
+        except KeyError:
+            pass
         if not this.opened:
             raise RuntimeError('Shop is closed')
         f = this.fixtures[k]
         if not this.backdoor_opened:
             self._on_checkout and self._on_checkout(f)
+            this.checked_out[k] = f
         return f
 
     @staticmethod
@@ -251,11 +397,46 @@ class FixtureShop:
 
 
 class _DepsCache(dict):
+    ''' {fixture: fixture.with_deps} shared by the requests of the mount.
+
+        It is prefilled at mount (see `prefill`), misses
+        (e.g. explicit FixtureService.use) are filled under the lock.
+    '''
+
+    def __init__(self, replaced=None):
+        super().__init__()
+        # {old_fixture: new_fixture} - swapped fixtures of the mount
+        self.replaced = replaced
+        self._lock = threading.Lock()
+
     def __missing__(self, f):
+        with self._lock:
+            v = self.get(f)
+            if v is None:
+                v = self._with_deps(f)
+                self.__setitem__(f, v)
+        return v
+
+    def _with_deps(self, f):
         v = f.with_deps
-        self.__setitem__(f, v)
+        if self.replaced:
+            v = self.replace(v, self.replaced)
         return v
 
+    def prefill(self, shops_fixtures):
+        ''' Fill for fixtures of {shop: {name: fixture}} (before serving requests).'''
+        [
+            self.__setitem__(f, self._with_deps(f))
+            for fixtures in shops_fixtures.values()
+            for f in fixtures.values()
+            if isinstance(f, BaseFixture) and f not in self
+        ]
+        return self
+
+    @staticmethod
+    def replace(fixtures, replaced):
+        return OrderedUniqSet([replaced.get(f, f) for f in fixtures])
+
 
 class FixtureService(LocalStorage):
 
@@ -263,16 +444,29 @@ class FixtureService(LocalStorage):
         self._reverse_postproc_order = reverse_postproc
         self._shops = set()
 
-    def init(self, app_ctx, ctx, staff_ctx, reverse_postproc=None):
-        if reverse_postproc is not None:
-            self._reverse_postproc_order = reverse_postproc
+    def init(self, app_ctx, ctx, staff_ctx, reverse_postproc=None, tracers=None, borrowed=None,
+             deps_cache=None):
+        # the service is shared between threads, so the override is per request
+        if reverse_postproc is None:
+            reverse_postproc = self._reverse_postproc_order
 
         local = self._safe_local = SimpleNamespace()
-        local.involved = OrderedUniqSet()
+        local.reverse_postproc = reverse_postproc
+        # borrowed - already taken on by the parent request (see BaseProcessor.subrequest),
+        # they are treated as involved, but their on_output/on_finalize are not called
+        local.borrowed = borrowed
+        local.involved = OrderedUniqSet(borrowed)
         local.app_ctx = app_ctx
         local.ctx = ctx
         local.staff_ctx = staff_ctx
-        staff_ctx.setdefault('fixtures_deps_cache', _DepsCache())
+        # instruments with `traces_hooks`
+        local.tracers = tracers
+        if deps_cache is None:
+            # not called by BaseProcessor, that passes the cache of the route plan version
+            deps_cache = staff_ctx.get('fixtures_deps_cache')
+            if deps_cache is None:
+                deps_cache = staff_ctx.setdefault('fixtures_deps_cache', _DepsCache())
+        local.deps_cache = deps_cache
 
     def serve(self, shop):
         if shop in self._shops:
@@ -295,35 +489,104 @@ class FixtureService(LocalStorage):
         if is_expanded:
             not_involved.add(*[f for f in fixtures if f not in involved])
         else:
-            deps_cache = local.staff_ctx['fixtures_deps_cache']
+            deps_cache = local.deps_cache
             [
                 not_involved.add(*deps_cache[f])
                 for f in fixtures if f not in involved
             ]
         involved.add(*not_involved)
-        [f.take_on(app_ctx, ctx) for f in not_involved]
+        if isinstance(ctx, RouteContext) and ctx.deadline is not None:
+            return self._use_with_deadline(not_involved, app_ctx, ctx)
+        tracers = local.tracers
+        n = 0
+        try:
+            if tracers:
+                for f in not_involved:
+                    n += 1
+                    self._traced(tracers, f, 'take_on', app_ctx, ctx)
+            else:
+                for f in not_involved:
+                    n += 1
+                    f.take_on(app_ctx, ctx)
+        except BaseException:
+            # interrupted (error, ShortCircuit): the failed fixture is finalized,
+            # the following ones were not taken on
+            [involved.pop(f) for f in [*not_involved][n:]]
+            raise
 
-    def on_output(self):
+    def _use_with_deadline(self, not_involved, app_ctx, ctx):
+        local = self._safe_local
+        tracers = local.tracers
+        rest = [*not_involved]
+        while rest:
+            try:
+                ctx.check_deadline()
+            except DeadlineExceeded:
+                # only taken on fixtures are finalized
+                [local.involved.pop(f) for f in rest]
+                raise
+            f = rest.pop(0)
+            try:
+                if tracers:
+                    self._traced(tracers, f, 'take_on', app_ctx, ctx)
+                else:
+                    f.take_on(app_ctx, ctx)
+            except BaseException:
+                [local.involved.pop(f) for f in rest]
+                raise
+
+    def on_output(self, only=None):
+        ''' only - limit to these fixtures (e.g. of a batch item)'''
         local = self._safe_local
         ctx = local.ctx
         app_ctx = local.app_ctx
         involved = local.involved
-        if self._reverse_postproc_order:
+        if local.borrowed:
+            involved = [f for f in involved if f not in local.borrowed]
+        if only is not None:
+            involved = [f for f in involved if f in only]
+        if local.reverse_postproc:
             involved = reversed(involved)
-        [obj.on_output(app_ctx, ctx) for obj in involved]
+        tracers = local.tracers
+        if tracers:
+            [self._traced(tracers, obj, 'on_output', app_ctx, ctx) for obj in involved]
+        else:
+            [obj.on_output(app_ctx, ctx) for obj in involved]
 
     def finalize(self):
         local = self._safe_local
         involved = local.involved
+        if local.borrowed:
+            [involved.pop(f, None) for f in local.borrowed]
+            local.borrowed = None
         if not involved:
             return True
-        if self._reverse_postproc_order:
+        if local.reverse_postproc:
             involved_ = [*reversed(involved)]
         else:
             involved_ = [*involved]
         app_ctx = local.app_ctx
         ctx = local.ctx
-        [involved.pop(f) and f.on_finalize(app_ctx, ctx) for f in involved_]
+        tracers = local.tracers
+        if tracers:
+            [
+                involved.pop(f) and self._traced(tracers, f, 'on_finalize', app_ctx, ctx)
+                for f in involved_
+            ]
+        else:
+            [involved.pop(f) and f.on_finalize(app_ctx, ctx) for f in involved_]
+
+    @staticmethod
+    def _traced(tracers, f, hook, app_ctx, ctx):
+        [t.on_hook(ctx, f, hook) for t in tracers]
+        error = None
+        try:
+            return getattr(f, hook)(app_ctx, ctx)
+        except BaseException as ex:
+            error = ex
+            raise
+        finally:
+            [t.on_hook_done(ctx, f, hook, error) for t in reversed(tracers)]
 
 
 class Ctx:
@@ -340,18 +603,109 @@ class Ctx:
         return ret
 
 
+class _BoundCtx:
+    ''' Lightweight Ctx.make_ctx result bound to the request,
+        attributes can be set as on the SimpleNamespace.
+    '''
+    __slots__ = ('app_ctx', 'request', 'response', '__dict__')
+
+    def __init__(self, app_ctx, request, response):
+        self.app_ctx = app_ctx
+        self.request = request
+        self.response = response
+
+
+class Provided:
+    ''' Inject a value provided by fixtures (see RouteContext.provide):
+
+        def index(user=Provided('user'), roles=Provided(default=())):  # key is `roles`
+    '''
+    __slots__ = ('key', 'default')
+
+    def __init__(self, key=None, default=None):
+        self.key = key
+        self.default = default
+
+
+class Use:
+    ''' Inject a fixture and take it on before run.
+
+        `fixture` is a fixture or a name of the shop fixture
+        (resolved against the mount, so FixtureHolder-s work):
+
+        def index(db=Use('db'), cache=Use(cache_fixture)):
+    '''
+    __slots__ = ('fixture',)
+
+    def __init__(self, fixture):
+        self.fixture = fixture
+
+
+class ShortCircuit(BaseException):
+    ''' Finish the request with `output` right away: exception handlers are skipped,
+        `on_output` of involved fixtures is called only if `on_output` is set,
+        `on_finalize` is called as usual.
+
+        Can be raised from `take_on` or the core function, or returned by the core function
+        (cheapest: no traceback at all). Instances can be preallocated and reused:
+
+        NOT_MODIFIED = ShortCircuit('')
+
+        def index():
+            if not_modified(): return NOT_MODIFIED
+    '''
+
+    def __init__(self, output=None, on_output=False):
+        super().__init__()
+        self.output = output
+        self.on_output = on_output
+
+
 class BubbleException(BaseException):
     def __init__(self, wrapped_exception):
         super().__init__(f'BubbleException for {str(wrapped_exception)}')
         self.wrapped_exception = wrapped_exception
 
 
+class BaseInstrument:
+    ''' Request flow observer, see BaseProcessor(instruments=...).
+
+        All callbacks are called in the request thread.
+    '''
+
+    # if set, on_hook/on_hook_done are called around each fixture hook
+    traces_hooks = False
+
+    def on_request(self, ctx: RouteContext):
+        pass
+
+    def on_phase(self, ctx: RouteContext):
+        ''' Called right after ctx.phase is changed.'''
+        pass
+
+    def on_done(self, ctx: RouteContext):
+        ''' Called at the very end of request (after gateway cleanup).'''
+        pass
+
+    def on_hook(self, ctx: RouteContext, fixture, hook):
+        ''' Called before `take_on`, `on_output` or `on_finalize` of the fixture.'''
+        pass
+
+    def on_hook_done(self, ctx: RouteContext, fixture, hook, error):
+        ''' Called after the fixture hook, `error` is the raised exception or None.'''
+        pass
+
+
 class BaseProcessor:
 
-    __slots__ = ('_local', 'inject_class')
+    __slots__ = ('_local', 'inject_class', 'instruments', 'ctx_pool')
 
-    def __init__(self, inject_class = None):
+    def __init__(self, inject_class = None, instruments=None, ctx_pool=0):
         self.inject_class = inject_class or Ctx
+        self.instruments = tuple(instruments or ())
+        # max number of reusable RouteContext per thread (0 - no pooling)
+        # NOTE: with pooling, the context must not be used after the request
+        self.ctx_pool = ctx_pool
         self._local = threading.local()
         this = self._local.this = SimpleNamespace()
         this.gateway = None
@@ -362,24 +716,58 @@ class BaseProcessor:
         this.fitter_ctx = None  # mounted context
         this.fixture_service = None
         this.exception_handlers = {}
-        this.inject = None
-
-    def _get_inject(self, fun):
-        aspec = inspect.getfullargspec(fun)
-        kwdefs = aspec.kwonlydefaults
-        if not kwdefs:
-            if aspec.defaults:
-                kw_names = aspec.args[-len(aspec.defaults):]
-                kwdefs = {k: v for k, v in zip(kw_names, aspec.defaults)}
-            else:
-                return None, None
-        inject = [(k, v) for k, v in kwdefs.items() if isinstance(v, self.inject_class)]
-        if not inject:
-            return None, None
-        arg_nm, ctx_maker = inject.pop()
-        if inject:
-            raise TypeError('Only one inject-arg allowed')
-        return arg_nm, ctx_maker
+        this.binder = None
+
+    def _compile_binder(self, fun, shop_fixtures_map):
+        '''Analyse injected args of `fun` once (at mount time).
+
+        Return (binder, fixtures to take on) where
+        binder(this, ctx, app_ctx, kwargs) fills kwargs per request.
+        '''
+        static = {}  # kw_name: value
+        bound = []  # [kw_name] - plain Ctx
+        makers = []  # [(kw_name, ctx_maker)]
+        provided = []  # [(kw_name, key, default)]
+        shop_fixtures = []  # [(kw_name, shop, fixture_name)]
+        use_fixtures = []
+        for k, p in inspect.signature(fun).parameters.items():
+            v = p.default
+            if isinstance(v, self.inject_class):
+                if type(v).make_ctx is Ctx.make_ctx:
+                    bound.append(k)
+                else:
+                    makers.append((k, v))
+            elif isinstance(v, Provided):
+                provided.append((k, v.key or k, v.default))
+            elif isinstance(v, Use):
+                f = v.fixture
+                if isinstance(f, str):
+                    shop = next((s for s, fixtures in shop_fixtures_map.items() if f in fixtures), None)
+                    if shop is None:
+                        raise AttributeError(f'There is no `{f}` fixture')
+                    shop_fixtures.append((k, shop, f))
+                    f = shop_fixtures_map[shop][f]
+                else:
+                    static[k] = f
+                use_fixtures.append(f)
+        if not (static or bound or makers or provided or shop_fixtures):
+            return None, use_fixtures
+
+        def binder(this, ctx, app_ctx, kwargs):
+            static and kwargs.update(static)
+            if provided:
+                ask = ctx._provided.get
+                for k, key, default in provided:
+                    kwargs[k] = ask(key, default)
+            for k in bound:
+                kwargs[k] = _BoundCtx(app_ctx, ctx.request, ctx.response)
+            for k, maker in makers:
+                kwargs[k] = maker.make_ctx(app_ctx, ctx.request, ctx.response)
+            if shop_fixtures:
+                shops = this.shop_fixtures_map
+                for k, shop, name in shop_fixtures:
+                    kwargs[k] = shops[shop][name]
+        return binder, use_fixtures
 
     @property
     def ctx(self):
@@ -389,96 +777,241 @@ class BaseProcessor:
                           front_fixtures, shop_fixtures_map, fitter_ctx,
                           exception_handlers=None):
 
-        expanded_fixtures = fixture_service.expand_deps(*front_fixtures)
+        binder, use_fixtures = self._compile_binder(fun, shop_fixtures_map)
+        # created before serving requests, the mount context is read-only on the request path
+        staff_ctx = fitter_ctx['staff_ctx']
+        if 'fixtures_deps_cache' not in staff_ctx:
+            staff_ctx['fixtures_deps_cache'] = _DepsCache().prefill(shop_fixtures_map)
+        expanded_fixtures = fixture_service.expand_deps(*front_fixtures, *use_fixtures)
         exception_handlers = exception_handlers or {}
         if '*' not in exception_handlers:
             exception_handlers['*'] = self.exception_default_handler
-        inject = self._get_inject(fun)
 
-        this = SimpleNamespace()
-        this.gateway = gateway
-        this.ctx = None
-        this.fun = fun
-        this.fixture_service = fixture_service
-        this.fixtures = expanded_fixtures
-        this.shop_fixtures_map = shop_fixtures_map
-        this.fitter_ctx = fitter_ctx
-        this.exception_handlers = exception_handlers
-        this.inject = inject
+        route = SimpleNamespace()
+        route.key = self._route_key(fun, fitter_ctx['app_ctx'])
+        route.tracers = tuple(i for i in self.instruments if i.traces_hooks)
+        route.gateway = gateway
+        route.ctx = None
+        route.fun = fun
+        route.fixture_service = fixture_service
+        route.fixtures = expanded_fixtures
+        route.shop_fixtures_map = shop_fixtures_map
+        route.version = 0
+        route.fitter_ctx = fitter_ctx
+        route.exception_handlers = exception_handlers
+        route.binder = binder
+        route.borrowed = None
+        # replaced with the plan on swap, in-flight requests keep their version
+        route.deps_cache = staff_ctx['fixtures_deps_cache']
 
         @functools.wraps(fun)
         def handler(*args, **kwargs):
-            self._local.this = this
+            # `route` is shared between threads, so `this` is a per-request copy
+            self._local.this = SimpleNamespace(**route.__dict__)
             return self.gateway(*args, **kwargs)
 
+        handler.__route__ = route
+        handler.subrequest = functools.partial(self.subrequest, route)
         return handler
 
+    def subrequest(self, route, *args, **kwargs):
+        '''Run the core handler of `route` inside the current request (`handler.subrequest(...)`).
+
+        Fixtures already taken on by the current request are reused as is,
+        the others are taken on and finalized within the sub-request.
+        The sub-request has its own RouteContext (output, shared_data, provided
+        values are copied from the parent), the gateway is not involved.
+        Return the output of the sub-request.
+        '''
+        local = self._local
+        request_ctx = LocalStorage.__request_master_ctx__.request_ctx
+        parent = request_ctx.get(BaseProcessor)
+        parent_ctx = parent and parent.ctx
+        this = SimpleNamespace(**route.__dict__)
+        ctx = this.ctx = RouteContext()
+        ctx.route = this.key
+        fs = this.fixture_service
+        if parent_ctx is not None:
+            ctx.request = parent_ctx.request
+            ctx.response = parent_ctx.response
+            ctx.deadline = parent_ctx.deadline
+            ctx._provided = dict(parent_ctx._provided)
+            parent_fs_local = request_ctx.get(parent.fixture_service)
+            if parent_fs_local is not None:
+                this.borrowed = OrderedUniqSet(parent_fs_local.involved)
+        saved_fs_local = request_ctx.get(fs)
+        saved_shops = {shop: getattr(shop._local, 'this', None) for shop in this.shop_fixtures_map}
+        saved_this = getattr(local, 'this', None)
+        local.this = request_ctx[BaseProcessor] = this
+        instruments = self.instruments
+        try:
+            [i.on_request(ctx) for i in instruments]
+            try:
+                return self.bubble_wrap(*args, **kwargs)
+            finally:
+                [i.on_done(ctx) for i in reversed(instruments)]
+        finally:
+            local.this = saved_this
+            if parent is not None:
+                request_ctx[BaseProcessor] = parent
+            else:
+                request_ctx.pop(BaseProcessor)
+            if saved_fs_local is not None:
+                request_ctx[fs] = saved_fs_local
+            for shop, shop_this in saved_shops.items():
+                shop._local.this = shop_this
+
+    @staticmethod
+    def _route_key(fun, app_ctx):
+        mount_stack = getattr(app_ctx, 'mount_stack', None)
+        app = '/'.join(c.name for c in mount_stack) if mount_stack else None
+        return RouteKey(app, fun.__qualname__)
+
     def gateway(self, *args, **kwargs):
         this = self._local.this
-        this.ctx = RouteContext()
-        self.init_context()
+        pool = self._ctx_pool() if self.ctx_pool else None
+        this.ctx = pool.pop() if pool else RouteContext()
+        this.ctx.route = this.key
+        # the current request of the thread (across processors), see subrequest
+        request_ctx = LocalStorage.__request_master_ctx__.request_ctx
+        outer = request_ctx.get(BaseProcessor)
+        request_ctx[BaseProcessor] = this
+        instruments = self.instruments
+        try:
+            self.init_context()
+            if not instruments:
+                return self._gateway(this, *args, **kwargs)
+            [i.on_request(this.ctx) for i in instruments]
+            try:
+                return self._gateway(this, *args, **kwargs)
+            finally:
+                [i.on_done(this.ctx) for i in reversed(instruments)]
+        finally:
+            # a finished request must not be a parent of subrequest/offload
+            if outer is None:
+                request_ctx.pop(BaseProcessor, None)
+            else:
+                request_ctx[BaseProcessor] = outer
+            pool is not None and self._recycle_ctx(this, pool)
+
+    def _ctx_pool(self):
+        try:
+            return self._local.ctx_pool
+        except AttributeError:
+            pool = self._local.ctx_pool = []
+            return pool
+
+    def _recycle_ctx(self, this, pool):
+        ctx = this.ctx
+        this.ctx = None
+        fs_local = LocalStorage.__request_master_ctx__.request_ctx.get(this.fixture_service)
+        if fs_local is not None and fs_local.ctx is ctx:
+            fs_local.ctx = None
+        # `ctx` + getrefcount() argument, any other reference means that
+        # the context escaped the request (stored by user code, traceback of the exception ...)
+        if sys.getrefcount(ctx) > 2 or len(pool) >= self.ctx_pool:
+            return
+        # the containers are cleared in place by reset(), so they must not escape either
+        # (e.g. shared_data of batch items)
+        refs = sys.getrefcount
+        if (
+            refs(ctx.shared_data) > 2 or refs(ctx._provided) > 2
+            or refs(ctx.finalize_exceptions) > 2 or refs(ctx.app_ctx) > 2
+        ):
+            return
+        ctx.reset()
+        pool.append(ctx)
+
+    def _gateway(self, this, *args, **kwargs):
         gateway = this.gateway
         if not gateway:
             return self.bubble_wrap(*args, **kwargs)
         app_ctx = this.fitter_ctx['app_ctx']
-        gateway.setup(app_ctx, this.ctx)
+        ctx = this.ctx
+        try:
+            gateway.setup(app_ctx, ctx)
+        except Exception as ex:
+            # e.g. rejected by ConcurrencyLimiter, no cleanup is required
+            ctx.exception = ex
+            ctx.successful = not getattr(ex, 'is_error', True)
+            return self.handle_exception(this, ex)
         try:
             return self.bubble_wrap(*args, **kwargs)
         finally:
-            gateway.cleanup(app_ctx, this.ctx)
+            gateway.cleanup(app_ctx, ctx)
 
     def bubble_wrap(self, *args, **kwargs):
         this = self._local.this
-        exception_handlers = this.exception_handlers
         try:
             ret = self.process(*args, **kwargs)
             if this.ctx.finalize_exceptions:
                 self.process_finalize_exceptions()
             return ret
         except BaseException as cur_ex:
-            app_ctx = this.fitter_ctx['app_ctx']
-            default_handler = exception_handlers['*']
-            handler = exception_handlers.get(cur_ex.__class__, default_handler)
-            max_rehandlered = 10
-            ex_stack = [cur_ex]
-            while len(ex_stack) < max_rehandlered:
-                try:
-                    return handler(app_ctx, this.ctx, cur_ex)
-                except BubbleException as ex:
-                    raise ex.wrapped_exception
-                except BaseException as ex:
-                    if ex is cur_ex:
-                        return default_handler(app_ctx, this.ctx, cur_ex)
-                    next_handler = exception_handlers.get(ex.__class__, default_handler)
-                    ex_stack.append(cur_ex)
-                    cur_ex = ex
-                    handler = next_handler
-            return default_handler(app_ctx, this.ctx, RuntimeError('Max rehandlered exceeded'))
+            return self.handle_exception(this, cur_ex)
+
+    def handle_exception(self, this, cur_ex):
+        ''' Dispatch to exception handlers, must be called from `except` block.'''
+        exception_handlers = this.exception_handlers
+        app_ctx = this.fitter_ctx['app_ctx']
+        default_handler = exception_handlers['*']
+        handler = exception_handlers.get(cur_ex.__class__, default_handler)
+        max_rehandlered = 10
+        ex_stack = [cur_ex]
+        while len(ex_stack) < max_rehandlered:
+            try:
+                return handler(app_ctx, this.ctx, cur_ex)
+            except BubbleException as ex:
+                raise ex.wrapped_exception
+            except BaseException as ex:
+                if ex is cur_ex:
+                    return default_handler(app_ctx, this.ctx, cur_ex)
+                next_handler = exception_handlers.get(ex.__class__, default_handler)
+                ex_stack.append(cur_ex)
+                cur_ex = ex
+                handler = next_handler
+        return default_handler(app_ctx, this.ctx, RuntimeError('Max rehandlered exceeded'))
 
     def process(self, *args, **kwargs):
         this = self._local.this
         ctx = this.ctx
         app_ctx = this.fitter_ctx['app_ctx']
-        kw_name, ctx_maker = this.inject
-        if kw_name:
-            kwargs[kw_name] = ctx_maker.make_ctx(
-                app_ctx, ctx.request, ctx.response
-            )
+        binder = this.binder
         fs: FixtureService = this.fixture_service
-        fs.init(app_ctx, ctx, this.fitter_ctx['staff_ctx'])
+        fs.init(
+            app_ctx, ctx, this.fitter_ctx['staff_ctx'], tracers=this.tracers,
+            borrowed=this.borrowed, deps_cache=this.deps_cache
+        )
+        instruments = self.instruments
         opened_shops = [
             shop.open(fixtures)
             for shop, fixtures in this.shop_fixtures_map.items()
         ]
         try:
-            ctx.phase = ProcessPhase.SETUP
-            fs.use(*this.fixtures, is_expanded=True)
-            ctx.phase = ProcessPhase.RUN
-            ctx.output = this.fun(*args, **kwargs)
+            try:
+                ctx.phase = ProcessPhase.SETUP
+                instruments and [i.on_phase(ctx) for i in instruments]
+                fs.use(*this.fixtures, is_expanded=True)
+                ctx.check_deadline()
+                ctx.phase = ProcessPhase.RUN
+                instruments and [i.on_phase(ctx) for i in instruments]
+                binder and binder(this, ctx, app_ctx, kwargs)
+                ctx.output = this.fun(*args, **kwargs)
+            except ShortCircuit as sc:
+                # don't keep frames of this request (instance can be reused)
+                sc.__traceback__ = sc.__context__ = None
+                ctx.output = sc
+            run_output = True
+            if isinstance(ctx.output, ShortCircuit):
+                run_output = ctx.output.on_output
+                ctx.output = ctx.output.output
             [opened_shops.pop().close() for _ in [*opened_shops]]
-            ctx.phase = ProcessPhase.OUTPUT
-            fs.on_output()
+            if run_output:
+                ctx.phase = ProcessPhase.OUTPUT
+                instruments and [i.on_phase(ctx) for i in instruments]
+                fs.on_output()
             ctx.phase = ProcessPhase.FINALIZE
+            instruments and [i.on_phase(ctx) for i in instruments]
             return ctx.output
         except BaseException as ex:
             ctx.exception = ex
@@ -495,6 +1028,102 @@ class BaseProcessor:
                     if ctx.stop_finalize:
                         raise ex
 
+    def batch(self, calls):
+        '''Run [(handler, args, kwargs), ...] of the same mount as one request.
+
+        The union of the route fixtures is taken on once, then each core function
+        is called with its own RouteContext (shared_data and provided values of the
+        setup are visible), `on_output` is called per item and the fixtures are
+        finalized once at the end. The gateway is set up once for the batch.
+        Errors of the items go to their route exception handlers,
+        unhandled ones are captured.
+        Return [SimpleNamespace(output, exception, ctx), ...]
+
+        This is an entry point like the handler itself, use subrequest inside a request.
+        '''
+        routes = [h.__route__ for h, *_ in calls]
+        if not routes:
+            return []
+        first = routes[0]
+        if any(r.fixture_service is not first.fixture_service for r in routes):
+            raise ValueError('Batched routes must share the fixture service')
+        fixtures = OrderedUniqSet()
+        [fixtures.add(*r.fixtures) for r in routes]
+        this = self._local.this = SimpleNamespace(**first.__dict__)
+        this.key = RouteKey(first.key.app, '<batch>')
+        this.fixtures = list(fixtures)
+        this.fun = functools.partial(self._run_batch, calls, routes)
+        this.binder = None
+        # shops are opened per item
+        this.shop_fixtures_map = {}
+        return self.gateway()
+
+    def _run_batch(self, calls, routes):
+        local = self._local
+        batch_this = local.this
+        batch_ctx = batch_this.ctx
+        fs_local = batch_this.fixture_service._safe_local
+        results = []
+        try:
+            for (h, *call), route in zip(calls, routes):
+                args = call[0] if call else ()
+                kwargs = dict(call[1]) if len(call) > 1 else {}
+                this = local.this = SimpleNamespace(**route.__dict__)
+                ctx = this.ctx = fs_local.ctx = RouteContext()
+                ctx.route = this.key
+                ctx.request = batch_ctx.request
+                ctx.response = batch_ctx.response
+                ctx.deadline = batch_ctx.deadline
+                ctx.shared_data = batch_ctx.shared_data
+                ctx._provided = dict(batch_ctx._provided)
+                results.append(self._run_item(this, ctx, args, kwargs))
+        finally:
+            local.this = batch_this
+            fs_local.ctx = batch_ctx
+        # item outputs are already passed through on_output
+        return ShortCircuit(results)
+
+    def _run_item(self, this, ctx, args, kwargs):
+        app_ctx = this.fitter_ctx['app_ctx']
+        fs = this.fixture_service
+        ret = SimpleNamespace(output=None, exception=None, ctx=ctx)
+        opened_shops = [
+            shop.open(fixtures)
+            for shop, fixtures in this.shop_fixtures_map.items()
+        ]
+        try:
+            try:
+                ctx.check_deadline()
+                ctx.phase = ProcessPhase.RUN
+                this.binder and this.binder(this, ctx, app_ctx, kwargs)
+                ctx.output = this.fun(*args, **kwargs)
+            except ShortCircuit as sc:
+                sc.__traceback__ = sc.__context__ = None
+                ctx.output = sc
+            run_output = True
+            if isinstance(ctx.output, ShortCircuit):
+                run_output = ctx.output.on_output
+                ctx.output = ctx.output.output
+            # the fixtures of the route and the ones the item checked out
+            used = OrderedUniqSet(this.fixtures)
+            deps_cache = fs._safe_local.deps_cache
+            [used.add(*deps_cache[f]) for shop in opened_shops for f in shop._local.this.checked_out.values()]
+            [opened_shops.pop().close() for _ in [*opened_shops]]
+            if run_output:
+                ctx.phase = ProcessPhase.OUTPUT
+                fs.on_output(used)
+        except Exception as ex:
+            ctx.exception = ex
+            ctx.successful = not getattr(ex, 'is_error', True)
+            try:
+                ctx.output = self.handle_exception(this, ex)
+            except Exception as ex_:
+                ret.exception = ex_
+        finally:
+            [opened_shops.pop().close() for _ in [*opened_shops]]
+        ret.output = ctx.output
+        return ret
+
     def init_context(self):
         pass
 
@@ -541,6 +1170,9 @@ class BaseAction:
     def make_handlers(self, app_ctx, app):
         yield from self._fitter.make_handlers(self._registered, app_ctx, app)
 
+    def warmup_fixtures(self, app_ctx, max_workers=None, timeout=None):
+        return self._fitter.warmup_fixtures(self._registered, app_ctx, max_workers, timeout)
+
     @property
     def registered(self):
         return self._registered
@@ -591,16 +1223,21 @@ class Fitter:
             fixture_service: FixtureService,
             shops,
             exception_handlers=None,
-            default_fixtures=None
+            default_fixtures=None,
+            gateways=None
     ):
 
         # allow to implement `mounter`
         self.outer_wrappers, self.inner_wrappers = default_fixtures or ([], [])
         self.exception_handlers = exception_handlers or {}
         self.processor = processor
+        # extra gateways (e.g. ConcurrencyLimiter) to set up before the app
+        self.gateways = list(gateways or [])
         self._fixture_service = fixture_service
         self._shops = tuple(shops)
         self._shops_frozen = False
+        self._warmed_up = {}
+        self._swap_lock = threading.Lock()
 
     def error(self, exception_class=None, handler=None):
         if not handler:
@@ -638,7 +1275,9 @@ class Fitter:
         }
         fitter_ctx = dict(
             staff_ctx = {},  # used for cache
-            app_ctx = app_ctx  # used as app_ctx (e.g. to store app_name)
+            app_ctx = app_ctx,  # used as app_ctx (e.g. to store app_name)
+            routes = [],  # used for fixtures swapping
+            version = 0,
         )
         exception_handlers = self.exception_handlers.copy()
         for fun, meta in registered.items():
@@ -646,13 +1285,145 @@ class Fitter:
                 fun, meta.fixtures, shops_striped_fixtures,
                 fitter_ctx, exception_handlers, app
             )
+            fitter_ctx['routes'].append(h.__route__)
             # yield handler for routing
             yield h, meta
 
+    def swap_fixtures(self, fitter_ctx, **fixtures):
+        '''Replace shop fixtures (FixtureHolder slots) of the live mount.
+
+        In-flight requests finish with the old fixtures, new requests get the new ones.
+        Only the route plans that contain replaced fixtures are re-expanded.
+        Return the new version of the mount.
+        '''
+        with self._swap_lock:
+            routes = fitter_ctx['routes']
+            if not routes:
+                raise RuntimeError('There are no mounted routes')
+            shops_fixtures = routes[0].shop_fixtures_map
+            replaced = {}
+            # previous replacements are still actual for holders resolved by `with_deps`
+            prev_replaced = fitter_ctx.get('replaced', {})
+            new_shops_fixtures = {}
+            for shop, shop_fixtures in shops_fixtures.items():
+                changes = {k: f for k, f in fixtures.items() if k in shop_fixtures}
+                for k in changes:
+                    if not isinstance(shop.fixtures[k], FixtureHolder):
+                        raise TypeError(f'Fixture `{k}` must be FixtureHolder instance')
+                    replaced[shop_fixtures[k]] = changes[k]
+                new_shops_fixtures[shop] = {**shop_fixtures, **changes} if changes else shop_fixtures
+            unknown = set(fixtures).difference(*new_shops_fixtures.values())
+            if unknown:
+                raise AttributeError(f'There is no `{unknown.pop()}` fixture')
+            all_replaced = {k: replaced.get(f, f) for k, f in prev_replaced.items()}
+            all_replaced.update(replaced)
+            version = fitter_ctx['version'] + 1
+            fitter_ctx['version'] = version
+            fitter_ctx['replaced'] = all_replaced
+            deps_cache = _DepsCache(all_replaced).prefill(new_shops_fixtures)
+            # for FixtureService users outside of the route plans
+            fitter_ctx['staff_ctx']['fixtures_deps_cache'] = deps_cache
+            deps_replace = _DepsCache.replace
+            for route in routes:
+                plan = dict(shop_fixtures_map=new_shops_fixtures, version=version, deps_cache=deps_cache)
+                if any(f in replaced for f in route.fixtures):
+                    fixtures = OrderedUniqSet()
+                    [
+                        fixtures.add(*deps_replace(replaced.get(f, f).with_deps, all_replaced))
+                        for f in route.fixtures
+                    ]
+                    plan['fixtures'] = list(fixtures)
+                # atomic for requests that copy the route
+                route.__dict__.update(plan)
+            return version
+
+    def promote_fixtures(self, fitter_ctx, plans):
+        '''Move shop fixtures into the SETUP plan of the routes of the live mount.
+
+        plans: {route_name: [shop_fixture_name, ...]}, route_name is `fun.__qualname__`
+        Promoted fixtures are taken on with the route fixtures instead of
+        lazily on checkout. Unknown routes and names are ignored (stale profile).
+        Return the number of changed routes.
+        '''
+        with self._swap_lock:
+            promoted = fitter_ctx.setdefault('promoted', {})
+            replaced = fitter_ctx.get('replaced')
+            changed = 0
+            for route in fitter_ctx['routes']:
+                names = plans.get(route.key.name)
+                if not names:
+                    continue
+                shop_fixtures = {}
+                [shop_fixtures.update(m) for m in route.shop_fixtures_map.values()]
+                names = [k for k in names if k in shop_fixtures]
+                fixtures = OrderedUniqSet(route.fixtures)
+                new = [shop_fixtures[k] for k in names if shop_fixtures[k] not in fixtures]
+                route_promoted = promoted.setdefault(route.key.name, [])
+                route_promoted.extend(k for k in names if k not in route_promoted)
+                if not new:
+                    continue
+                for f in new:
+                    deps = f.with_deps
+                    fixtures.add(*(_DepsCache.replace(deps, replaced) if replaced else deps))
+                route.__dict__.update(fixtures=list(fixtures))
+                changed += 1
+            return changed
+
+    def warmup_fixtures(self, registered, app_ctx, max_workers=None, timeout=None):
+        '''Call `warmup(app_ctx)` concurrently for all fixtures reachable from
+        the registered routes and the shops.
+
+        Each fixture is warmed up once (successfully) across all mounts.
+        Return {fixture: SimpleNamespace(duration, error)}
+        '''
+        expand_deps = self._fixture_service.expand_deps
+        reachable = OrderedUniqSet()
+        for meta in registered.values():
+            reachable.add(*expand_deps(*self.outer_wrappers, *meta.fixtures, *self.inner_wrappers))
+        for s in self._shops:
+            reachable.add(*expand_deps(*[
+                f for f in s.striped_fixtures.values() if isinstance(f, BaseFixture)
+            ]))
+        todo = [
+            f for f in reachable
+            if f not in self._warmed_up and type(f).warmup is not BaseFixture.warmup
+        ]
+        report = {}
+        if not todo:
+            return report
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers, thread_name_prefix='omfitt-warmup'
+        )
+        futures = {executor.submit(self._warmup_fixture, f, app_ctx): f for f in todo}
+        done, _ = concurrent.futures.wait(futures, timeout)
+        executor.shutdown(wait=False)
+        for fut, f in futures.items():
+            if fut in done:
+                res = fut.result()
+            else:
+                fut.cancel()
+                res = SimpleNamespace(duration=None, error=TimeoutError('Warmup timeout exceeded'))
+            if res.error is None:
+                self._warmed_up[f] = res
+            report[f] = res
+        return report
+
+    @staticmethod
+    def _warmup_fixture(f, app_ctx):
+        error = None
+        t0 = time.perf_counter()
+        try:
+            f.warmup(app_ctx)
+        except Exception as ex:
+            error = ex
+        return SimpleNamespace(duration=time.perf_counter() - t0, error=error)
+
     def _make_handler(self, fun, fixtures, shops_striped_fixtures,
                       fitter_ctx, exception_handlers, app):
         make_core_handler = self.processor.make_core_handler
         gateway = app
+        if self.gateways:
+            gateway = GatewayChain(*self.gateways, *([app] if app is not None else []))
         fixtures = self.outer_wrappers + fixtures + self.inner_wrappers
         core_handler = make_core_handler(
             fun, gateway, self._fixture_service, fixtures,
@@ -682,6 +1453,9 @@ class BaseCtx:
 
         self.named_routes = {}
         self.routes = []
+        # {core_function: handler}
+        self.handlers = {}
+        self.warmup_report = None
 
         if master_ctx:
             if name in master_ctx.children:
@@ -696,6 +1470,11 @@ class BaseCtx:
 
 
 class BaseApp:
+    # call fixtures warmup on mount, see Fitter.warmup_fixtures
+    warmup_on_mount = False
+    warmup_workers = None
+    warmup_timeout = None
+
     def __init__(self, action: BaseAction):
         self._action = action
         self._local = threading.local()
@@ -712,14 +1491,52 @@ class BaseApp:
     def mount(self, name=None, master_ctx=None, **props):
         app_ctx = self._make_ctx(name, master_ctx, props)
         for h, meta in self._action.make_handlers(app_ctx, self):
+            app_ctx.handlers[h.__wrapped__] = h
             for args in meta.route_args:
                 self._mount_route(app_ctx, h, args)
+        if self.warmup_on_mount:
+            app_ctx.warmup_report = self.warmup(app_ctx)
         self._mounted()
         return app_ctx
 
+    def warmup(self, app_ctx):
+        return self._action.warmup_fixtures(
+            app_ctx, self.warmup_workers, self.warmup_timeout
+        )
+
     def _mounted(self):
         pass
 
+    def swap_fixtures(self, app_ctx, **fixtures):
+        '''Replace shop fixtures of the live mount, see Fitter.swap_fixtures.
+
+        app.swap_fixtures(app_ctx, db=Database(new_credentials))
+        '''
+        if not app_ctx.handlers:
+            raise RuntimeError('There are no mounted routes')
+        fitter_ctx = next(iter(app_ctx.handlers.values())).__route__.fitter_ctx
+        return self._action.fitter.swap_fixtures(fitter_ctx, **fixtures)
+
+    def promote_fixtures(self, app_ctx, plans):
+        '''Preload promoted fixtures into the live mount, see Fitter.promote_fixtures.
+
+        app.promote_fixtures(app_ctx, json.load(open('plans.json')))
+        '''
+        if not app_ctx.handlers:
+            raise RuntimeError('There are no mounted routes')
+        fitter_ctx = next(iter(app_ctx.handlers.values())).__route__.fitter_ctx
+        return self._action.fitter.promote_fixtures(fitter_ctx, plans)
+
+    def export_plans(self, app_ctx):
+        '''Return {route_name: [shop_fixture_name, ...]} promoted so far.
+
+        json.dump(app.export_plans(app_ctx), open('plans.json', 'w'))
+        '''
+        if not app_ctx.handlers:
+            return {}
+        fitter_ctx = next(iter(app_ctx.handlers.values())).__route__.fitter_ctx
+        return {k: [*v] for k, v in fitter_ctx.get('promoted', {}).items()}
+
     def _make_ctx(self, name, master_ctx, props):
         return BaseCtx(self, name, master_ctx, props)
 
@@ -727,14 +1544,36 @@ class BaseApp:
         pass
 
     def __getattr__(self, p):
+        # the app is shared between threads, so props are kept per thread
+        local = self._local
+        ret = local.props.get(p)
+        if ret is not None:
+            return ret
         prop: 'BaseAppProp' = self._app_props[p]
         ret = prop.setup()
         if ret is None:
             ret = prop
-        self._local.used_props.append([p, prop])
-        setattr(self, p, ret)
+        local.used_props.append([p, prop])
+        local.props[p] = ret
         return ret
 
+    def batch(self, app_ctx, calls):
+        '''Run [(core_function, args, kwargs), ...] of the mount as one request,
+        see BaseProcessor.batch.
+        '''
+        calls = [(app_ctx.handlers[fun], *call) for fun, *call in calls]
+        return self._action.fitter.processor.batch(calls)
+
+    def subrequest(self, target, fun, *args, **kwargs):
+        '''Call core function `fun` mounted in `target` (child app name or BaseCtx)
+        inside the current request, see BaseProcessor.subrequest.
+
+        html = app.subrequest('first', api_index)
+        '''
+        # the child app may be mounted more than once, its own local points to any of the mounts
+        ctx = target if isinstance(target, BaseCtx) else self._local.ctx.children[target]
+        return ctx.handlers[fun].subrequest(*args, **kwargs)
+
     def __getitem__(self, app_name):
         """Return initialized child app."""
         local = self._local
@@ -753,17 +1592,19 @@ class BaseApp:
         local.ctx = ctx
         local.used_methods = set()
         local.used_props = []
+        local.props = {}
         local.used_apps = {}
         # route_ctx.provide('url', self.url)
 
     def cleanup(self, ctx=None, route_ctx=None):
         local = self._local
-        [[prop.cleanup(), self.__dict__.pop(p)] for p, prop in self._local.used_props]
+        [prop.cleanup() for p, prop in local.used_props]
         [app.cleanup() for app in local.used_apps.values()]
         [meth.cleanup() for meth in local.used_methods]
         local.ctx = None
         local.used_methods = None
         local.used_props = None
+        local.props = None
         local.used_apps = None
 
 
@@ -788,3 +1629,74 @@ class BaseAppMethod(BaseAppProp):
         if self not in app_used_methods:
             self.setup()
             app_used_methods.add(self)
+
+
+class _ShardHolder:
+    __slots__ = ('shard', '__weakref__')
+
+    def __init__(self, shard):
+        self.shard = shard
+
+
+class _ThreadShards:
+    ''' Per-thread shards of an instrument.
+
+        The shard of a finished thread is passed to `retire(shard)` (under the lock)
+        to be folded into the instrument base accumulator, so the number of shards
+        is bounded by the number of live threads.
+    '''
+
+    def __init__(self, make, retire):
+        self.lock = threading.RLock()
+        self._make = make
+        self._retire = retire
+        self._local = threading.local()
+        # {id(shard): shard}
+        self._shards = {}
+
+    def get(self):
+        try:
+            return self._local.holder.shard
+        except AttributeError:
+            pass
+        # the holder is dropped with the thread-local data when the thread ends
+        holder = self._local.holder = _ShardHolder(self._make())
+        with self.lock:
+            self._shards[id(holder.shard)] = holder.shard
+        weakref.finalize(holder, self._fold, holder.shard)
+        return holder.shard
+
+    def _fold(self, shard):
+        with self.lock:
+            del self._shards[id(shard)]
+            self._retire(shard)
+
+    def live(self):
+        ''' Return the shards of live threads, must be called under the lock.'''
+        return [*self._shards.values()]
+
+    def __len__(self):
+        return len(self._shards)
+
+
+class DeadlineGateway(BaseGateway):
+    ''' Set per-request deadline (RouteContext.deadline).
+
+        `timeout` - default budget in seconds,
+        `from_request(route_ctx)` - return budget in seconds (e.g. from a header) or None.
+
+        DeadlineGateway(5, lambda ctx: float(ctx.request.headers.get('X-Timeout', 0)) or None)
+    '''
+
+    def __init__(self, timeout=None, from_request=None):
+        self.timeout = timeout
+        self.from_request = from_request
+
+    def setup(self, app_ctx, route_ctx):
+        if self.timeout is not None:
+            route_ctx.set_timeout(self.timeout)
+        seconds = self.from_request and self.from_request(route_ctx)
+        if seconds is not None:
+            route_ctx.set_timeout(seconds)
+
+
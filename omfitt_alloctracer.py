@@ -0,0 +1,140 @@
+'''Allocations of fixture hooks (tracemalloc).'''
+import threading
+import tracemalloc
+import random
+from types import SimpleNamespace
+
+from omfitt import ProcessPhase, BaseInstrument
+
+
+class AllocationTracer(BaseInstrument):
+    ''' Attribute net allocations (tracemalloc) to fixture hooks and
+        core functions of a sampled `rate` of requests.
+
+        tracemalloc is started for the sampled requests only (unless it is
+        already tracing). The traced memory is process-wide, so allocations of
+        concurrent requests are noise that averages out with enough samples.
+        Allocations of nested hooks (e.g. lazy checkouts) are not counted
+        for the core function.
+
+        tracer = AllocationTracer(rate=0.01)
+        processor = BaseProcessor(instruments=[tracer])
+        ...
+        for rec in tracer.top(10):
+            print(rec.route, rec.fixture, rec.per_request, rec.hooks)
+    '''
+
+    traces_hooks = True
+
+    def __init__(self, rate=0.01, frames=1):
+        self.rate = rate
+        self.frames = frames
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._active = 0
+        self._owns_tracing = False
+        # {(route, fixture): {hook: [size, calls]}}, fixture is None for the core function
+        self._stats = {}
+        # {route: sampled requests}
+        self._sampled = {}
+
+    def _requests(self):
+        try:
+            return self._local.requests
+        except AttributeError:
+            ret = self._local.requests = []
+            return ret
+
+    def _start(self):
+        with self._lock:
+            if not self._active and not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+                self._owns_tracing = True
+            self._active += 1
+
+    def _stop(self):
+        with self._lock:
+            self._active -= 1
+            if not self._active and self._owns_tracing:
+                tracemalloc.stop()
+                self._owns_tracing = False
+
+    def _add(self, route, fixture, hook, size):
+        with self._lock:
+            hooks = self._stats.setdefault((route, fixture), {})
+            acc = hooks.get(hook)
+            if acc is None:
+                acc = hooks[hook] = [0, 0]
+            acc[0] += size
+            acc[1] += 1
+
+    def _pop_frame(self, ctx, stack, fixture, hook):
+        start, nested = stack.pop()
+        delta = tracemalloc.get_traced_memory()[0] - start
+        if stack:
+            stack[-1][1] += delta
+        self._add(ctx.route, fixture, hook, delta - nested)
+
+    def on_request(self, ctx):
+        sampled = random.random() < self.rate
+        if sampled:
+            self._start()
+        # [sampled, stack of [start_size, nested_size], core frame]
+        self._requests().append([sampled, [], None])
+
+    def on_phase(self, ctx):
+        rec = self._local.requests[-1]
+        if not rec[0]:
+            return
+        stack = rec[1]
+        if rec[2] is not None:
+            rec[2] = None
+            self._pop_frame(ctx, stack, None, 'core')
+        if ctx.phase is ProcessPhase.RUN:
+            rec[2] = [tracemalloc.get_traced_memory()[0], 0]
+            stack.append(rec[2])
+
+    def on_hook(self, ctx, fixture, hook):
+        rec = self._local.requests[-1]
+        rec[0] and rec[1].append([tracemalloc.get_traced_memory()[0], 0])
+
+    def on_hook_done(self, ctx, fixture, hook, error):
+        rec = self._local.requests[-1]
+        rec[0] and self._pop_frame(ctx, rec[1], fixture, hook)
+
+    def on_done(self, ctx):
+        sampled, stack, core = self._local.requests.pop()
+        if not sampled:
+            return
+        if core is not None:
+            # the core function raised
+            self._pop_frame(ctx, stack, None, 'core')
+        with self._lock:
+            self._sampled[ctx.route] = self._sampled.get(ctx.route, 0) + 1
+        self._stop()
+
+    def top(self, n=10):
+        ''' Return the `n` largest net allocators:
+            [SimpleNamespace(route, fixture, size, per_request, hooks={hook: size})]
+            fixture is None for the core function.
+        '''
+        with self._lock:
+            stats = {k: {h: [*v] for h, v in hooks.items()} for k, hooks in self._stats.items()}
+            sampled = {**self._sampled}
+        ret = []
+        for (route, fixture), hooks in stats.items():
+            size = sum(v[0] for v in hooks.values())
+            ret.append(SimpleNamespace(
+                route=route,
+                fixture=fixture,
+                size=size,
+                per_request=size / (sampled.get(route) or 1),
+                hooks={h: v[0] for h, v in hooks.items()},
+            ))
+        ret.sort(key=lambda r: r.size, reverse=True)
+        return ret[:n]
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+            self._sampled = {}
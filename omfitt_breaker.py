@@ -0,0 +1,137 @@
+'''Circuit breaker around a fixture.'''
+import threading
+import enum
+import time
+from collections import deque
+
+from omfitt import BaseFixture
+
+
+class CircuitState(str, enum.Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+
+class CircuitOpen(Exception):
+    status = 503
+
+    def __init__(self, breaker: 'CircuitBreaker'):
+        super().__init__(f'Circuit is open for {breaker.fixture!r}')
+        self.breaker = breaker
+
+
+class CircuitBreaker(BaseFixture):
+    ''' Wraps a fixture to fail fast when it is unhealthy.
+
+        If `failures` hooks of the wrapped fixture fail within `window` seconds,
+        the circuit opens and `take_on` raises `exception(breaker)` immediately,
+        so the error goes to Fitter.error handlers without touching the dependency.
+        After `reset_timeout` seconds one request is let through as a probe (half-open):
+        its success closes the circuit, its failure opens it again.
+
+        db = CircuitBreaker(Database(...), failures=5, window=30, reset_timeout=10)
+        shop.db.query(...)  # attribute access is delegated to the wrapped fixture
+    '''
+
+    def __init__(self, fixture, failures=5, window=30.0, reset_timeout=10.0,
+                 exception=CircuitOpen, failure_exceptions=(Exception,)):
+        self.fixture = fixture
+        # the wrapped fixture is called by the breaker, so its deps become the breaker deps
+        self.__prerequisites__ = [*fixture.__prerequisites__]
+        self.failures = failures
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.exception = exception
+        self.failure_exceptions = failure_exceptions
+        self._state = CircuitState.CLOSED
+        self._failed_at = deque()
+        self._opened_at = None
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, k):
+        if k == 'fixture':
+            raise AttributeError(k)
+        return getattr(self.fixture, k)
+
+    @property
+    def state(self):
+        return self._state
+
+    def warmup(self, app_ctx):
+        self.fixture.warmup(app_ctx)
+
+    def stats(self):
+        with self._lock:
+            return dict(
+                state=self._state,
+                failures=len(self._failed_at),
+                rejected=self._rejected,
+                opened_at=self._opened_at,
+            )
+
+    def _admit(self):
+        state = self._state
+        if state is CircuitState.CLOSED:
+            return
+        with self._lock:
+            state = self._state
+            if state is CircuitState.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                # let this request probe
+                self._state = CircuitState.HALF_OPEN
+                return
+            if state is not CircuitState.CLOSED:
+                self._rejected += 1
+                raise self.exception(self)
+
+    def _on_failure(self):
+        now = time.monotonic()
+        with self._lock:
+            if self._state is CircuitState.HALF_OPEN:
+                self._state = CircuitState.OPEN
+                self._opened_at = now
+                return
+            failed_at = self._failed_at
+            failed_at.append(now)
+            while failed_at and failed_at[0] < now - self.window:
+                failed_at.popleft()
+            if self._state is CircuitState.CLOSED and len(failed_at) >= self.failures:
+                self._state = CircuitState.OPEN
+                self._opened_at = now
+                failed_at.clear()
+
+    def _on_success(self):
+        if self._state is CircuitState.HALF_OPEN:
+            with self._lock:
+                self._state = CircuitState.CLOSED
+                self._failed_at.clear()
+
+    def _call(self, hook, app_ctx, ctx):
+        try:
+            hook(app_ctx, ctx)
+        except self.failure_exceptions:
+            self._on_failure()
+            raise
+
+    def take_on(self, app_ctx, ctx):
+        # whether the wrapped fixture is taken on in this request
+        self._safe_local = False
+        self._admit()
+        try:
+            self._call(self.fixture.take_on, app_ctx, ctx)
+        except BaseException:
+            # the probe raised an exception not counted as failure - don't stay half-open
+            if self._state is CircuitState.HALF_OPEN:
+                self._on_failure()
+            raise
+        self._safe_local = True
+        self._on_success()
+
+    def on_output(self, app_ctx, ctx):
+        if self._safe_local:
+            self._call(self.fixture.on_output, app_ctx, ctx)
+
+    def on_finalize(self, app_ctx, ctx):
+        if self._safe_local:
+            self._call(self.fixture.on_finalize, app_ctx, ctx)
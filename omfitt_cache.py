@@ -0,0 +1,113 @@
+'''TTL cache of provided values.'''
+import threading
+import time
+from collections import OrderedDict
+
+from omfitt import BaseFixture
+
+
+class ProvideCache:
+    ''' Cross-request cache of provided values keyed by (provider key, cache key)
+        with `ttl`, LRU eviction over `maxsize` and optional negative caching:
+        None results are cached for `negative_ttl` seconds (not cached if it is None).
+
+        Entries are split into lock-striped shards, the provider is called
+        outside of the lock (concurrent misses may call it more than once).
+    '''
+
+    _missing = object()
+
+    def __init__(self, maxsize=10000, ttl=60, negative_ttl=None, shards=16):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+        self._shard_maxsize = max(1, maxsize // shards)
+        self.hits = 0
+        self.misses = 0
+
+    def _shard(self, k):
+        return self._shards[hash(k) % len(self._shards)]
+
+    def get(self, key, cache_key, default=None):
+        k = (key, cache_key)
+        lock, entries = self._shard(k)
+        with lock:
+            # [expires, value]
+            e = entries.get(k)
+            if e is not None:
+                if e[0] > time.monotonic():
+                    entries.move_to_end(k)
+                    self.hits += 1
+                    return e[1]
+                del entries[k]
+            self.misses += 1
+        return default
+
+    def set(self, key, cache_key, value):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl is None:
+            return
+        k = (key, cache_key)
+        lock, entries = self._shard(k)
+        with lock:
+            entries.pop(k, None)
+            if len(entries) >= self._shard_maxsize:
+                entries.popitem(last=False)
+            entries[k] = [time.monotonic() + ttl, value]
+
+    def get_or_provide(self, key, cache_key, provider):
+        ''' Return the cached value or the result of `provider()` which is cached.'''
+        value = self.get(key, cache_key, self._missing)
+        if value is self._missing:
+            value = provider()
+            self.set(key, cache_key, value)
+        return value
+
+    def invalidate(self, key, cache_key=_missing):
+        ''' Drop the entry or all entries of the provider `key`.'''
+        if cache_key is not self._missing:
+            k = (key, cache_key)
+            lock, entries = self._shard(k)
+            with lock:
+                entries.pop(k, None)
+            return
+        for lock, entries in self._shards:
+            with lock:
+                [entries.pop(k) for k in [k for k in entries if k[0] == key]]
+
+    def clear(self):
+        for lock, entries in self._shards:
+            with lock:
+                entries.clear()
+
+
+class CachedProvider(BaseFixture):
+    ''' Provide `key` value (ctx.provide) computed by `provider(app_ctx, ctx, cache_key)`
+        through the shared ProvideCache.
+
+        `cache_key(app_ctx, ctx)` identifies the value across requests (e.g. session token),
+        if it returns None the provider is called without caching.
+
+        user = CachedProvider(
+            'user', lambda app_ctx, ctx: ctx.request.cookies.get('sid'),
+            load_user_by_session, ProvideCache(ttl=30, negative_ttl=5)
+        )
+        ...
+        user.cache.invalidate('user', sid)  # on logout
+    '''
+
+    def __init__(self, key, cache_key, provider, cache=None):
+        self.key = key
+        self.cache_key = cache_key
+        self.provider = provider
+        self.cache = cache if cache is not None else ProvideCache()
+
+    def take_on(self, app_ctx, ctx):
+        ck = self.cache_key(app_ctx, ctx)
+        if ck is None:
+            value = self.provider(app_ctx, ctx, None)
+        else:
+            value = self.cache.get_or_provide(
+                self.key, ck, lambda: self.provider(app_ctx, ctx, ck)
+            )
+        ctx.provide(self.key, value)
@@ -0,0 +1,164 @@
+'''Timeline of the last requests in a ring buffer.'''
+import threading
+import time
+import array
+import itertools
+
+from omfitt import ProcessPhase, BaseInstrument
+
+
+class FlightRecorder(BaseInstrument):
+    ''' Records a compact timeline of the last `size` requests:
+        route, start, duration, exception class, number of finalize errors
+        and up to `max_events` events (phase changes and fixture hooks with
+        their start/end relative to the request start).
+
+        Records live in preallocated arrays (ring buffer),
+        `dump()` decodes them on demand.
+        `on_error(record)` is called for each failed request.
+    '''
+
+    traces_hooks = True
+    HOOKS = ('phase', 'take_on', 'on_output', 'on_finalize')
+    PHASES = (None, *ProcessPhase)
+
+    def __init__(self, size=1024, max_events=32, on_error=None):
+        self.size = size
+        self.max_events = max_events
+        self.on_error = on_error
+        self._counter = itertools.count()
+        self._local = threading.local()
+        self._intern_lock = threading.Lock()
+        # interned routes, fixtures, exception classes
+        self._routes = ({}, [])
+        self._fixtures = ({}, [])
+        self._exceptions = ({}, [])
+        self._hook_codes = {k: i for i, k in enumerate(self.HOOKS)}
+        self._phase_codes = {k: i for i, k in enumerate(self.PHASES)}
+
+        n = size * max_events
+        self.req_seq = array.array('q', [-1]) * size
+        self.req_start = array.array('d', [0.0]) * size
+        self.req_duration = array.array('d', [-1.0]) * size
+        self.req_route = array.array('l', [-1]) * size
+        self.req_exception = array.array('l', [-1]) * size
+        self.req_finalize_errors = array.array('l', [0]) * size
+        self.req_events = array.array('l', [0]) * size
+        self.ev_fixture = array.array('l', [-1]) * n
+        self.ev_hook = array.array('b', [0]) * n
+        self.ev_phase = array.array('b', [0]) * n
+        self.ev_start = array.array('d', [0.0]) * n
+        self.ev_end = array.array('d', [0.0]) * n
+        self.ev_error = array.array('l', [-1]) * n
+
+    def _intern(self, table, obj):
+        index, items = table
+        ret = index.get(obj)
+        if ret is None:
+            with self._intern_lock:
+                ret = index.get(obj)
+                if ret is None:
+                    ret = index[obj] = len(items)
+                    items.append(obj)
+        return ret
+
+    def _stack(self):
+        try:
+            return self._local.stack
+        except AttributeError:
+            ret = self._local.stack = []
+            return ret
+
+    def on_request(self, ctx):
+        seq = next(self._counter)
+        slot = seq % self.size
+        self.req_seq[slot] = seq
+        self.req_start[slot] = time.time()
+        self.req_duration[slot] = -1.0
+        self.req_route[slot] = self._intern(self._routes, ctx.route)
+        self.req_exception[slot] = -1
+        self.req_finalize_errors[slot] = 0
+        self.req_events[slot] = 0
+        # [slot, seq, t0, open events]
+        self._stack().append([slot, seq, time.perf_counter(), []])
+
+    def _add_event(self, rec, fixture, hook, phase):
+        slot, seq, t0, _ = rec
+        n = self.req_events[slot]
+        if self.req_seq[slot] != seq or n >= self.max_events:
+            # overwritten by a newer request or too many events
+            return -1
+        e = slot * self.max_events + n
+        self.req_events[slot] = n + 1
+        self.ev_fixture[e] = -1 if fixture is None else self._intern(self._fixtures, fixture)
+        self.ev_hook[e] = self._hook_codes[hook]
+        self.ev_phase[e] = self._phase_codes.get(phase, 0)
+        self.ev_start[e] = self.ev_end[e] = time.perf_counter() - t0
+        self.ev_error[e] = -1
+        return e
+
+    def on_phase(self, ctx):
+        self._add_event(self._local.stack[-1], None, 'phase', ctx.phase)
+
+    def on_hook(self, ctx, fixture, hook):
+        rec = self._local.stack[-1]
+        rec[3].append(self._add_event(rec, fixture, hook, ctx.phase))
+
+    def on_hook_done(self, ctx, fixture, hook, error):
+        rec = self._local.stack[-1]
+        e = rec[3].pop()
+        if e < 0 or self.req_seq[rec[0]] != rec[1]:
+            return
+        self.ev_end[e] = time.perf_counter() - rec[2]
+        if error is not None:
+            self.ev_error[e] = self._intern(self._exceptions, error.__class__)
+
+    def on_done(self, ctx):
+        slot, seq, t0, _ = self._local.stack.pop()
+        if self.req_seq[slot] != seq:
+            return
+        failed = ctx.exception is not None and not ctx.successful
+        if failed:
+            self.req_exception[slot] = self._intern(self._exceptions, ctx.exception.__class__)
+        self.req_finalize_errors[slot] = len(ctx.finalize_exceptions)
+        self.req_duration[slot] = time.perf_counter() - t0
+        if self.on_error and (failed or ctx.finalize_exceptions):
+            self.on_error(self._decode(slot))
+
+    def _decode(self, slot):
+        fixtures = self._fixtures[1]
+        exceptions = self._exceptions[1]
+        exc = self.req_exception[slot]
+        base = slot * self.max_events
+        events = []
+        for e in range(base, base + self.req_events[slot]):
+            f = self.ev_fixture[e]
+            err = self.ev_error[e]
+            events.append(dict(
+                fixture=None if f < 0 else fixtures[f],
+                hook=self.HOOKS[self.ev_hook[e]],
+                phase=self.PHASES[self.ev_phase[e]],
+                start=self.ev_start[e],
+                end=self.ev_end[e],
+                error=None if err < 0 else exceptions[err].__name__,
+            ))
+        return dict(
+            seq=self.req_seq[slot],
+            route=self._routes[1][self.req_route[slot]],
+            start=self.req_start[slot],
+            duration=self.req_duration[slot],
+            exception=None if exc < 0 else exceptions[exc].__name__,
+            finalize_errors=self.req_finalize_errors[slot],
+            events=events,
+        )
+
+    def dump(self, last=None):
+        ''' Return decoded records of the last completed requests, oldest first.'''
+        slots = [
+            i for i in range(self.size)
+            if self.req_seq[i] >= 0 and self.req_duration[i] >= 0
+        ]
+        slots.sort(key=self.req_seq.__getitem__)
+        if last is not None:
+            slots = slots[-last:] if last else []
+        return [self._decode(i) for i in slots]
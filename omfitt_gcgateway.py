@@ -0,0 +1,141 @@
+'''Garbage collection between requests.'''
+import threading
+import time
+import gc
+from types import SimpleNamespace
+
+from omfitt import BaseGateway
+
+
+class GCGateway(BaseGateway):
+    ''' Keeps the automatic garbage collection disabled and collects
+        when there are no requests in flight:
+        in the background thread after the last request if `thresholds`
+        (as gc.set_threshold) are reached, or every `idle` seconds.
+        Under constant load the request cleanup collects if there are
+        `max_pending` or more young objects.
+
+        The automatic GC is disabled by `start()`, called on the first request
+        if `autostart`. One instance per process, `close()` restores the automatic GC.
+
+        Collections run in the request thread during the request are reported as
+        ctx.shared_data['metrics']['gc_pause_seconds'] (see Metrics); collections
+        of other threads also stall the request (GIL) but are not included.
+
+        gc_gateway = GCGateway()
+        fitter = Fitter(processor, fixture_service, shops, gateways=[gc_gateway])
+    '''
+
+    def __init__(self, thresholds=None, max_pending=None, idle=1.0, autostart=True):
+        self.thresholds = tuple(thresholds or gc.get_threshold())
+        self.max_pending = max_pending or self.thresholds[0] * 10
+        self.idle = idle
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._in_flight = 0
+        self._gc_start = None
+        # pause of the collections run in the thread
+        self._thread_pause = threading.local()
+        self.pause_total = 0.0
+        self.pause_max = 0.0
+        self.collections = [0, 0, 0]
+        self.forced = 0
+        self._thread = None
+        self._gc_was_enabled = None
+        self.autostart = autostart
+        # close() disables autostart
+        self._closed = False
+
+    def start(self):
+        with self._lock:
+            self._closed = False
+            self._start()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        self._gc_was_enabled = gc.isenabled()
+        gc.disable()
+        gc.callbacks.append(self._on_gc)
+        self._stopped = False
+        self._thread = threading.Thread(target=self._loop, name='omfitt-gc', daemon=True)
+        self._thread.start()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            thread, self._thread = self._thread, None
+            if thread is None:
+                return
+            self._stopped = True
+            self._wake.set()
+        thread.join()
+        gc.callbacks.remove(self._on_gc)
+        self._gc_was_enabled and gc.enable()
+
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self._gc_start = time.perf_counter()
+            return
+        if self._gc_start is None:
+            return
+        pause = time.perf_counter() - self._gc_start
+        self._gc_start = None
+        local = self._thread_pause
+        local.total = getattr(local, 'total', 0.0) + pause
+        self.pause_total += pause
+        self.pause_max = max(self.pause_max, pause)
+        self.collections[info['generation']] += 1
+
+    def due_generation(self, idle=False):
+        ''' Return the generation to collect (None - nothing to do).'''
+        c0, c1, c2 = gc.get_count()
+        t0, t1, t2 = self.thresholds
+        if c0 < (1 if idle else t0):
+            return None
+        if c1 + 1 >= t1:
+            return 2 if c2 + 1 >= t2 else 1
+        return 0
+
+    def _loop(self):
+        while not self._stopped:
+            woken = self._wake.wait(self.idle)
+            self._wake.clear()
+            if self._stopped:
+                return
+            # new requests wait for the collection anyway (GIL)
+            with self._lock:
+                if self._in_flight:
+                    continue
+                gen = self.due_generation(idle=not woken)
+                gen is not None and gc.collect(gen)
+
+    def setup(self, app_ctx, route_ctx):
+        with self._lock:
+            if self._thread is None and self.autostart and not self._closed:
+                self._start()
+            self._in_flight += 1
+        self._safe_local = getattr(self._thread_pause, 'total', 0.0)
+
+    def cleanup(self, app_ctx, route_ctx):
+        with self._lock:
+            self._in_flight -= 1
+            last = not self._in_flight
+        if last:
+            self.due_generation() is not None and self._wake.set()
+        elif gc.get_count()[0] >= self.max_pending:
+            self.forced += 1
+            gc.collect(self.due_generation() or 0)
+        metrics = route_ctx.shared_data.get('metrics')
+        if metrics is None:
+            metrics = route_ctx.shared_data['metrics'] = {}
+        metrics['gc_pause_seconds'] = getattr(self._thread_pause, 'total', 0.0) - self._safe_local
+
+    def stats(self):
+        return SimpleNamespace(
+            in_flight=self._in_flight,
+            collections=[*self.collections],
+            forced=self.forced,
+            pause_total=self.pause_total,
+            pause_max=self.pause_max,
+        )
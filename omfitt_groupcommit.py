@@ -0,0 +1,133 @@
+'''Group commit: one write for the requests of a short window.'''
+import threading
+import time
+import traceback
+
+from omfitt import BaseFixture
+
+
+class _CommitBatch:
+    __slots__ = ('items', 'opened', 'done', 'error')
+
+    def __init__(self):
+        self.items = []
+        self.opened = None
+        self.done = threading.Event()
+        self.error = None
+
+
+class GroupCommitFixture(BaseFixture):
+    ''' Write-behind fixture: collects per-request writes and commits them
+        in batches shared across concurrent requests.
+
+        class Hits(GroupCommitFixture):
+            def commit_batch(self, items):
+                with db.transaction():
+                    db.bulk_increment(items)
+
+        or GroupCommitFixture(commit=db.bulk_increment).
+        Inside request: `shop.hits.write(page_id)`.
+        A batch is flushed once `max_batch` items are collected
+        or `window` seconds passed since the first item.
+        With `durable=True` `on_finalize` waits until the batch is committed
+        and re-raises the commit error (see ctx.finalize_exceptions).
+        Subclasses that override `take_on` must call super().
+    '''
+
+    def __init__(self, max_batch=100, window=0.01, durable=False, timeout=None, commit=None):
+        if commit is None and type(self).commit_batch is GroupCommitFixture.commit_batch:
+            raise TypeError('`commit` is required unless commit_batch is overridden')
+        self.commit = commit
+        self.max_batch = max_batch
+        self.window = window
+        self.durable = durable
+        self.timeout = timeout
+        self._gc_cond = threading.Condition()
+        self._gc_batch = _CommitBatch()
+        self._gc_flusher = None
+
+    def take_on(self, app_ctx, ctx):
+        self._safe_local = []
+
+    def write(self, *items):
+        self._safe_local.extend(items)
+
+    def merge(self, items):
+        ''' Called by the flusher with all items of the batch,
+            returns what is passed to `commit_batch`.
+        '''
+        return items
+
+    def commit_batch(self, items):
+        self.commit(items)
+
+    def on_commit_error(self, items, ex):
+        ''' Called on commit error in non-durable mode.'''
+        pass
+
+    def on_finalize(self, app_ctx, ctx):
+        items = self._safe_local
+        if not items or not ctx.successful:
+            return
+        batch = self.submit(items)
+        if self.durable:
+            if not batch.done.wait(self.timeout):
+                raise TimeoutError('Group commit is not acknowledged')
+            if batch.error is not None:
+                raise batch.error
+
+    def submit(self, items):
+        cond = self._gc_cond
+        with cond:
+            batch = self._gc_batch
+            if not batch.items:
+                batch.opened = time.monotonic()
+            batch.items.extend(items)
+            if self._gc_flusher is None or not self._gc_flusher.is_alive():
+                self._gc_flusher = threading.Thread(
+                    target=self._flush_loop, name=f'omfitt-group-commit-{id(self):x}', daemon=True
+                )
+                self._gc_flusher.start()
+            cond.notify()
+        return batch
+
+    def flush(self):
+        ''' Commit pending items now (e.g. at shutdown).'''
+        with self._gc_cond:
+            batch = self._gc_batch
+            self._gc_batch = _CommitBatch()
+        if batch.items:
+            self._commit(batch)
+
+    def _flush_loop(self):
+        cond = self._gc_cond
+        while True:
+            with cond:
+                while not self._gc_batch.items:
+                    cond.wait()
+                batch = self._gc_batch
+                deadline = batch.opened + self.window
+                while len(batch.items) < self.max_batch:
+                    rest = deadline - time.monotonic()
+                    if rest <= 0:
+                        break
+                    cond.wait(rest)
+                if self._gc_batch is not batch:
+                    # already taken by flush()
+                    continue
+                self._gc_batch = _CommitBatch()
+            self._commit(batch)
+
+    def _commit(self, batch):
+        try:
+            self.commit_batch(self.merge(batch.items))
+        except Exception as ex:
+            batch.error = ex
+            if not self.durable:
+                try:
+                    self.on_commit_error(batch.items, ex)
+                except Exception:
+                    # the flusher must survive
+                    traceback.print_exc()
+        finally:
+            batch.done.set()
@@ -0,0 +1,121 @@
+'''Concurrency limit of the routes.'''
+import threading
+
+from omfitt import BaseGateway
+
+
+class Overloaded(Exception):
+    ''' Raised by ConcurrencyLimiter.setup when the request is shed,
+        use Fitter.error(Overloaded) to render 503.
+    '''
+    status = 503
+
+
+class _ConcurrencySlots:
+    __slots__ = ('limit', 'queue_size', 'active', 'waiting', 'cond')
+
+    def __init__(self, limit, queue_size):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiting = 0
+        self.cond = threading.Condition(threading.Lock())
+
+    def acquire(self, timeout):
+        cond = self.cond
+        with cond:
+            if self.active < self.limit:
+                self.active += 1
+                return
+            if self.waiting >= self.queue_size:
+                raise Overloaded('Too many requests in queue')
+            self.waiting += 1
+            try:
+                acquired = cond.wait_for(lambda: self.active < self.limit, timeout)
+            finally:
+                self.waiting -= 1
+            if not acquired:
+                raise Overloaded('Timeout waiting for a free slot')
+            self.active += 1
+
+    def release(self):
+        with self.cond:
+            self.active -= 1
+            self.cond.notify()
+
+
+class ConcurrencyLimiter(BaseGateway):
+    ''' Admission control gateway: global and per-route concurrency limits
+        with a bounded wait queue.
+
+        Requests over the limit wait in the queue up to `timeout` seconds,
+        if the queue is full they are rejected immediately with `Overloaded`.
+        Routes matched by `bypass` (route names, mount paths or a callable(route_ctx))
+        are never limited - e.g. health checks and admin routes.
+
+        limiter = ConcurrencyLimiter(limit=64, route_limits={'report': 4}, queue_size=128,
+                                     timeout=1, bypass=['health'])
+        fitter = Fitter(processor, fixture_service, shops, gateways=[limiter])
+    '''
+
+    def __init__(self, limit=None, route_limits=None, queue_size=0, timeout=None, bypass=None):
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._global = _ConcurrencySlots(limit, queue_size) if limit else None
+        # {RouteKey | name: limit}
+        self._route_limits = route_limits or {}
+        self._route_slots = {}
+        self._lock = threading.Lock()
+        if bypass is None or callable(bypass):
+            self._bypass = bypass
+        else:
+            bypass = frozenset(bypass)
+            self._bypass = lambda route_ctx: (
+                route_ctx.route in bypass
+                or route_ctx.route.name in bypass
+                or route_ctx.route.app in bypass
+            )
+        self._local = threading.local()
+
+    def _slots_for(self, route):
+        try:
+            return self._route_slots[route]
+        except KeyError:
+            pass
+        limits = self._route_limits
+        limit = limits.get(route) or limits.get(route.name) or limits.get(route.app)
+        with self._lock:
+            ret = self._route_slots.setdefault(
+                route, _ConcurrencySlots(limit, self.queue_size) if limit else None
+            )
+        return ret
+
+    def setup(self, app_ctx, route_ctx):
+        acquired = []
+        route = route_ctx.route
+        if route is not None and not (self._bypass and self._bypass(route_ctx)):
+            route_slots = self._slots_for(route)
+            try:
+                for slots in (route_slots, self._global):
+                    if slots is not None:
+                        slots.acquire(self.timeout)
+                        acquired.append(slots)
+            except Overloaded:
+                [s.release() for s in acquired]
+                raise
+        try:
+            self._local.stack.append(acquired)
+        except AttributeError:
+            self._local.stack = [acquired]
+
+    def cleanup(self, app_ctx, route_ctx):
+        [s.release() for s in self._local.stack.pop()]
+
+    def stats(self):
+        ret = {
+            route: (s.active, s.waiting)
+            for route, s in [*self._route_slots.items()] if s is not None
+        }
+        if self._global:
+            ret['*'] = (self._global.active, self._global.waiting)
+        return ret
@@ -0,0 +1,198 @@
+'''In-process concurrent load harness for mounted omfitt apps.
+
+    python -m omfitt_load myapp:app --threads 8 --requests 10000
+    python -m omfitt_load myapp:app_ctx --mode asyncio --threads 64
+
+`target` is either a mounted app context (the result of `app.mount()`)
+or a BaseApp instance which is mounted by the harness.
+'''
+import argparse
+import asyncio
+import importlib
+import itertools
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+from omfitt import BaseApp, LocalStorage, _DepsCache
+
+
+def get_handlers(target):
+    if isinstance(target, BaseApp):
+        target = target.mount('omfitt_load')
+    if not target.handlers:
+        raise ValueError(f'There are no mounted routes in {target}')
+    return list(target.handlers.values())
+
+
+def _deps_caches(handlers):
+    caches = {
+        id(cache): cache
+        for h in handlers
+        for cache in [h.__route__.fitter_ctx['staff_ctx'].get('fixtures_deps_cache')]
+        if isinstance(cache, _DepsCache)
+    }
+    return list(caches.values())
+
+
+def _local_probe(local, n=1000):
+    '''Return ns per thread-local attribute access.'''
+    local.probe = None
+    t0 = time.perf_counter_ns()
+    for _ in range(n):
+        local.probe
+    return (time.perf_counter_ns() - t0) / n
+
+
+class _Worker:
+    probe_every = 100
+
+    def __init__(self, handlers, make_args, counter, total):
+        self.handlers = handlers
+        self.make_args = make_args
+        self.counter = counter
+        self.total = total
+        self.latencies = []
+        self.errors = {}
+        self.local_probes = []
+        self._local = threading.local()
+
+    def call(self, i):
+        h = self.handlers[i % len(self.handlers)]
+        args, kwargs = self.make_args(h, i) if self.make_args else ((), {})
+        LocalStorage.__init_request_ctx__()
+        t0 = time.perf_counter()
+        try:
+            h(*args, **kwargs)
+        except Exception as ex:
+            name = ex.__class__.__name__
+            self.errors[name] = self.errors.get(name, 0) + 1
+        self.latencies.append(time.perf_counter() - t0)
+        if not i % self.probe_every:
+            self.local_probes.append(_local_probe(self._local))
+
+    def run(self):
+        for i in self.counter:
+            if i >= self.total:
+                break
+            self.call(i)
+
+    async def run_async(self):
+        for i in self.counter:
+            if i >= self.total:
+                break
+            self.call(i)
+            await asyncio.sleep(0)
+
+
+def _percentile(sorted_data, p):
+    if not sorted_data:
+        return 0.0
+    k = min(len(sorted_data) - 1, int(round(p / 100 * (len(sorted_data) - 1))))
+    return sorted_data[k]
+
+
+def run(target, threads=4, requests=1000, mode='thread', make_args=None):
+    '''Drive the handlers of `target` (see `get_handlers`) or a list of handlers
+    with `requests` synthetic requests from `threads` threads
+    (or asyncio tasks when mode='asyncio').
+
+    make_args(handler, i) -> (args, kwargs) builds the request arguments.
+    Return SimpleNamespace with throughput, latency percentiles and contention stats.
+    '''
+    handlers = get_handlers(target) if not isinstance(target, list) else target
+    counter = itertools.count()
+    workers = [_Worker(handlers, make_args, counter, requests) for _ in range(threads)]
+    deps_caches = _deps_caches(handlers)
+    deps_cached = sum(len(c) for c in deps_caches)
+    idle_local_ns = _local_probe(threading.local(), 10000)
+
+    cpu0 = time.process_time()
+    t0 = time.perf_counter()
+    if mode == 'thread':
+        pool = [threading.Thread(target=w.run, name=f'omfitt-load-{i}') for i, w in enumerate(workers)]
+        [t.start() for t in pool]
+        [t.join() for t in pool]
+    elif mode == 'asyncio':
+        async def main():
+            await asyncio.gather(*[w.run_async() for w in workers])
+        asyncio.run(main())
+    else:
+        raise ValueError(f'Unknown mode: {mode}')
+    wall = time.perf_counter() - t0
+    cpu = time.process_time() - cpu0
+
+    latencies = sorted(itertools.chain(*[w.latencies for w in workers]))
+    errors = {}
+    for w in workers:
+        for k, v in w.errors.items():
+            errors[k] = errors.get(k, 0) + v
+    local_probes = [*itertools.chain(*[w.local_probes for w in workers])]
+    # deps-cache of handlers made without Fitter is created by the first request
+    deps_caches = deps_caches or _deps_caches(handlers)
+    return SimpleNamespace(
+        mode=mode,
+        concurrency=threads,
+        requests=len(latencies),
+        errors=errors,
+        wall=wall,
+        throughput=len(latencies) / wall if wall else 0.0,
+        latency=SimpleNamespace(
+            p50=_percentile(latencies, 50),
+            p90=_percentile(latencies, 90),
+            p99=_percentile(latencies, 99),
+            max=latencies[-1] if latencies else 0.0,
+        ),
+        contention=SimpleNamespace(
+            # ~1.0 means requests are serialized by the GIL
+            cpu_parallelism=cpu / wall if wall else 0.0,
+            switch_interval=sys.getswitchinterval(),
+            local_access_ns=sum(local_probes) / len(local_probes) if local_probes else 0.0,
+            local_access_idle_ns=idle_local_ns,
+            deps_cache_writes=sum(len(c) for c in deps_caches) - deps_cached,
+        ),
+    )
+
+
+def format_result(res):
+    lat = res.latency
+    cont = res.contention
+    lines = [
+        f'mode: {res.mode}, concurrency: {res.concurrency}',
+        f'requests: {res.requests}, errors: {sum(res.errors.values())} {res.errors or ""}',
+        f'throughput: {res.throughput:.1f} req/s (wall {res.wall:.3f}s)',
+        'latency ms: p50={:.3f} p90={:.3f} p99={:.3f} max={:.3f}'.format(
+            lat.p50 * 1e3, lat.p90 * 1e3, lat.p99 * 1e3, lat.max * 1e3
+        ),
+        f'cpu parallelism: {cont.cpu_parallelism:.2f} (switch interval {cont.switch_interval}s)',
+        f'threading.local access: {cont.local_access_ns:.0f} ns (idle {cont.local_access_idle_ns:.0f} ns)',
+        f'shared deps-cache writes during run: {cont.deps_cache_writes}',
+    ]
+    return '\n'.join(lines)
+
+
+def load_target(spec):
+    mod_name, _, attr = spec.partition(':')
+    obj = importlib.import_module(mod_name)
+    for a in (attr or 'app').split('.'):
+        obj = getattr(obj, a)
+    return obj
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m omfitt_load', description=__doc__.split('\n')[0])
+    parser.add_argument('target', help='module:attr of a mounted app context or BaseApp')
+    parser.add_argument('-t', '--threads', type=int, nargs='+', default=[4],
+                        help='concurrency levels to run, e.g. -t 1 2 4 8')
+    parser.add_argument('-n', '--requests', type=int, default=1000)
+    parser.add_argument('-m', '--mode', choices=['thread', 'asyncio'], default='thread')
+    args = parser.parse_args(argv)
+    handlers = get_handlers(load_target(args.target))
+    for n in args.threads:
+        print(format_result(run(handlers, n, args.requests, args.mode)))
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,174 @@
+'''Per-route request metrics in Prometheus text format.'''
+import time
+import itertools
+from types import SimpleNamespace
+
+from omfitt import BaseInstrument, _ThreadShards
+
+
+class _RouteStats:
+    __slots__ = ('requests', 'in_flight', 'errors', 'phases', 'duration', 'observed')
+
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        # {exception_class_name: count}
+        self.errors = {}
+        # {phase: [sum, count]}
+        self.phases = {}
+        self.duration = [0.0, 0]
+        # {name: [sum, count]} - ctx.shared_data['metrics']
+        self.observed = {}
+
+
+class Metrics(BaseInstrument):
+    ''' Per-route request/error counters, phase durations and in-flight gauges.
+        Gateways and fixtures can report per-request values in
+        ctx.shared_data['metrics'] = {name: value}, they are rendered as summaries.
+
+        Each thread writes into its own shard without locking,
+        shards are merged on `collect()`/`render()` only.
+
+        metrics = Metrics()
+        processor = BaseProcessor(instruments=[metrics])
+
+        @action('metrics')
+        def metrics_route():
+            response.headers['Content-Type'] = Metrics.content_type
+            return metrics.render()
+    '''
+
+    content_type = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self, prefix='omfitt'):
+        self.prefix = prefix
+        # {route: SimpleNamespace} of the finished threads
+        self._base = {}
+        # ({route: _RouteStats}, stack of in-flight requests)
+        self._shards = _ThreadShards(lambda: ({}, []), lambda shard: self._merge(self._base, shard[0]))
+        self._shard = self._shards.get
+
+    def on_request(self, ctx):
+        routes, stack = self._shard()
+        st = routes.get(ctx.route)
+        if st is None:
+            st = routes[ctx.route] = _RouteStats()
+        st.in_flight += 1
+        t = time.perf_counter()
+        # [stats, start, phase, phase_start]
+        stack.append([st, t, None, t])
+
+    def on_phase(self, ctx):
+        rec = self._shard()[1][-1]
+        t = time.perf_counter()
+        if rec[2] is not None:
+            self._add_phase(rec[0], rec[2], t - rec[3])
+        rec[2] = ctx.phase
+        rec[3] = t
+
+    def on_done(self, ctx):
+        st, start, phase, phase_start = self._shard()[1].pop()
+        t = time.perf_counter()
+        if phase is not None:
+            self._add_phase(st, phase, t - phase_start)
+        st.duration[0] += t - start
+        st.duration[1] += 1
+        st.in_flight -= 1
+        st.requests += 1
+        errors = st.errors
+        ex = ctx.exception
+        if ex is not None and not ctx.successful:
+            k = ex.__class__.__name__
+            errors[k] = errors.get(k, 0) + 1
+        for ex in ctx.finalize_exceptions:
+            k = ex.__class__.__name__
+            errors[k] = errors.get(k, 0) + 1
+        observed = ctx.shared_data.get('metrics')
+        if observed:
+            for k, v in observed.items():
+                acc = st.observed.get(k)
+                if acc is None:
+                    acc = st.observed[k] = [0.0, 0]
+                acc[0] += v
+                acc[1] += 1
+
+    @staticmethod
+    def _add_phase(st, phase, dt):
+        acc = st.phases.get(phase)
+        if acc is None:
+            acc = st.phases[phase] = [0.0, 0]
+        acc[0] += dt
+        acc[1] += 1
+
+    def collect(self):
+        ''' Return {RouteKey: SimpleNamespace} merged from all threads.'''
+        with self._shards.lock:
+            ret = self._merge({}, self._base)
+            shards = self._shards.live()
+        for routes, _ in shards:
+            self._merge(ret, routes)
+        return ret
+
+    @staticmethod
+    def _merge(ret, routes):
+        for route, st in [*routes.items()]:
+            acc = ret.get(route)
+            if acc is None:
+                acc = ret[route] = SimpleNamespace(
+                    requests=0, in_flight=0, errors={}, phases={}, duration=[0.0, 0], observed={}
+                )
+            acc.requests += st.requests
+            acc.in_flight += st.in_flight
+            for k, v in [*st.errors.items()]:
+                acc.errors[k] = acc.errors.get(k, 0) + v
+            for k, (v, n) in [*st.phases.items()]:
+                p = acc.phases.setdefault(k, [0.0, 0])
+                p[0] += v
+                p[1] += n
+            for k, (v, n) in [*st.observed.items()]:
+                o = acc.observed.setdefault(k, [0.0, 0])
+                o[0] += v
+                o[1] += n
+            acc.duration[0] += st.duration[0]
+            acc.duration[1] += st.duration[1]
+        return ret
+
+    def render(self):
+        ''' Return metrics in Prometheus text exposition format.'''
+        p = self.prefix
+        data = self.collect()
+        requests = [f'# HELP {p}_requests_total Processed requests.', f'# TYPE {p}_requests_total counter']
+        errors = [f'# HELP {p}_errors_total Failed requests by exception class.', f'# TYPE {p}_errors_total counter']
+        in_flight = [f'# HELP {p}_in_flight Requests in progress.', f'# TYPE {p}_in_flight gauge']
+        duration = [f'# HELP {p}_request_seconds Request duration.', f'# TYPE {p}_request_seconds summary']
+        phases = [f'# HELP {p}_phase_seconds Request phase duration.', f'# TYPE {p}_phase_seconds summary']
+        # {name: lines}
+        observed = {}
+        for route, st in data.items():
+            lb = self._labels(app=route.app, route=route.name)
+            requests.append(f'{p}_requests_total{{{lb}}} {st.requests}')
+            in_flight.append(f'{p}_in_flight{{{lb}}} {st.in_flight}')
+            duration.append(f'{p}_request_seconds_sum{{{lb}}} {st.duration[0]!r}')
+            duration.append(f'{p}_request_seconds_count{{{lb}}} {st.duration[1]}')
+            for k, v in st.errors.items():
+                errors.append(f'{p}_errors_total{{{lb},{self._labels(exception=k)}}} {v}')
+            for ph, (v, n) in st.phases.items():
+                plb = f'{lb},{self._labels(phase=getattr(ph, "value", ph))}'
+                phases.append(f'{p}_phase_seconds_sum{{{plb}}} {v!r}')
+                phases.append(f'{p}_phase_seconds_count{{{plb}}} {n}')
+            for k, (v, n) in st.observed.items():
+                lines = observed.get(k)
+                if lines is None:
+                    lines = observed[k] = [f'# HELP {p}_{k} Per-request value.', f'# TYPE {p}_{k} summary']
+                lines.append(f'{p}_{k}_sum{{{lb}}} {v!r}')
+                lines.append(f'{p}_{k}_count{{{lb}}} {n}')
+        return '\n'.join([*requests, *errors, *in_flight, *duration, *phases, *itertools.chain(*observed.values()), ''])
+
+    @staticmethod
+    def _labels(**labels):
+        return ','.join(
+            '{}="{}"'.format(
+                k, str('' if v is None else v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            )
+            for k, v in labels.items()
+        )
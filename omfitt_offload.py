@@ -0,0 +1,109 @@
+'''Run core functions in a process pool.'''
+import threading
+import functools
+import concurrent.futures
+import multiprocessing
+import sys
+import pickle
+import importlib
+from collections import namedtuple
+
+from omfitt import DeadlineExceeded, LocalStorage, BaseProcessor
+
+
+_SharedResult = namedtuple('_SharedResult', 'name size')
+_offload_executor = None
+_offload_executor_lock = threading.Lock()
+
+
+def _default_offload_executor():
+    global _offload_executor
+    with _offload_executor_lock:
+        if _offload_executor is None:
+            # created lazily while server threads run: forking them could copy held locks
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _offload_executor = concurrent.futures.ProcessPoolExecutor(
+                mp_context=multiprocessing.get_context(method))
+        return _offload_executor
+
+
+def _offload_run(ref, payload, shm_threshold):
+    ''' Worker side of `offload`.'''
+    module, qualname = ref
+    fun = sys.modules.get(module) or importlib.import_module(module)
+    for a in qualname.split('.'):
+        fun = getattr(fun, a)
+    args, kwargs = pickle.loads(payload)
+    ret = fun.__wrapped__(*args, **kwargs)
+    if shm_threshold is not None and isinstance(ret, (bytes, bytearray)) and len(ret) >= shm_threshold:
+        # 3.8+, imported here to keep the module importable on 3.7
+        from multiprocessing import shared_memory, resource_tracker
+        shm = shared_memory.SharedMemory(create=True, size=len(ret))
+        shm.buf[:len(ret)] = ret
+        shm.close()
+        # the parent unlinks it
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return _SharedResult(shm.name, len(ret))
+    return ret
+
+
+def _take_shared(res):
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=res.name)
+    try:
+        return bytes(shm.buf[:res.size])
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def _drop_abandoned(future):
+    if not future.cancelled() and future.exception() is None:
+        res = future.result()
+        isinstance(res, _SharedResult) and _take_shared(res)
+
+
+def offload(executor=None, shm_threshold=1 << 20):
+    ''' Run the core function in a process pool (default - shared ProcessPoolExecutor
+        with forkserver/spawn workers), fixtures hooks are still called in the request process.
+        A custom `executor` should be created at startup, before server threads.
+
+        @action('report')
+        @action.uses(db)
+        @offload()
+        def report(rows=Provided('rows')):
+            return render_pdf(rows)
+
+        The function must be importable by its module/qualname, the arguments
+        (including injected ones) and the result must be picklable.
+        bytes results of `shm_threshold` size or larger come back via shared memory.
+        The wait is limited by the request deadline (see RouteContext.deadline).
+    '''
+
+    def decorator(fun):
+        ref = (fun.__module__, fun.__qualname__)
+        if '<locals>' in ref[1]:
+            raise TypeError(f'Offloaded function must be importable: {ref[1]}')
+
+        @functools.wraps(fun)
+        def wrapper(*args, **kwargs):
+            try:
+                payload = pickle.dumps((args, kwargs), pickle.HIGHEST_PROTOCOL)
+            except Exception as ex:
+                raise TypeError(f'Arguments of offloaded {ref[1]} must be picklable: {ex}') from ex
+            request = getattr(LocalStorage.__request_master_ctx__, 'request_ctx', {}).get(BaseProcessor)
+            timeout = request.ctx.remaining() if request is not None and request.ctx is not None else None
+            future = (executor or _default_offload_executor()).submit(
+                _offload_run, ref, payload, shm_threshold
+            )
+            try:
+                ret = future.result(timeout)
+            except concurrent.futures.TimeoutError:
+                # the running call can't be stopped, its result is dropped
+                future.cancel() or future.add_done_callback(_drop_abandoned)
+                raise DeadlineExceeded('Request deadline exceeded') from None
+            if isinstance(ret, _SharedResult):
+                ret = _take_shared(ret)
+            return ret
+        return wrapper
+    return decorator
@@ -0,0 +1,109 @@
+'''Lazy checkout profile and adaptive fixture promotion.'''
+from omfitt import ProcessPhase, BaseInstrument, _ThreadShards
+
+
+class CheckoutProfile(BaseInstrument):
+    ''' Count lazy checkouts (take_on in the RUN phase) of fixtures per route
+        and promote the frequent ones into the route SETUP plan.
+
+        profile = CheckoutProfile(threshold=0.5, min_requests=100)
+        processor = BaseProcessor(instruments=[profile])
+        ...
+        app_ctx = app.mount()
+        profile.attach(app_ctx)  # adaptive mode
+
+        Promotion is checked every `min_requests` requests of the route in a thread
+        by the counts of that thread.
+        The learned plans are exported/preloaded with
+        `app.export_plans(app_ctx)` / `app.promote_fixtures(app_ctx, plans)`.
+    '''
+
+    traces_hooks = True
+
+    def __init__(self, threshold=0.5, min_requests=100):
+        self.threshold = threshold
+        self.min_requests = min_requests
+        # {RouteKey: (app_ctx, route)}
+        self._attached = {}
+        # {route: [requests, {fixture: checkouts}]} of the finished threads
+        self._base = {}
+        self._shards = _ThreadShards(dict, lambda shard: self._merge(self._base, shard))
+        self._shard = self._shards.get
+
+    def attach(self, app_ctx):
+        ''' Enable adaptive promotion for the routes of the mount.'''
+        self._attached.update({h.__route__.key: (app_ctx, h.__route__) for h in app_ctx.handlers.values()})
+
+    def on_request(self, ctx):
+        shard = self._shard()
+        st = shard.get(ctx.route)
+        if st is None:
+            st = shard[ctx.route] = [0, {}]
+        st[0] += 1
+
+    def on_hook(self, ctx, fixture, hook):
+        if hook != 'take_on' or ctx.phase is not ProcessPhase.RUN:
+            return
+        st = self._shard().get(ctx.route)
+        if st is None:
+            # item of BaseProcessor.batch
+            return
+        checkouts = st[1]
+        checkouts[fixture] = checkouts.get(fixture, 0) + 1
+
+    def on_done(self, ctx):
+        if not self._attached:
+            return
+        requests, checkouts = self._shard()[ctx.route]
+        if requests % self.min_requests or ctx.route not in self._attached:
+            return
+        # the counts of this thread are a sample of the route, no merge on the request path
+        app_ctx, route = self._attached[ctx.route]
+        hot = self._hot(route, requests, checkouts)
+        if hot and not set(hot).issubset(route.fitter_ctx.get('promoted', {}).get(route.key.name, ())):
+            app_ctx.app.promote_fixtures(app_ctx, {route.key.name: hot})
+
+    def collect(self):
+        ''' Return {RouteKey: (requests, {fixture: checkouts})} merged from all threads.'''
+        with self._shards.lock:
+            ret = self._merge({}, self._base)
+            shards = self._shards.live()
+        for shard in shards:
+            self._merge(ret, shard)
+        return {k: tuple(v) for k, v in ret.items()}
+
+    @staticmethod
+    def _merge(ret, shard):
+        for route, (requests, checkouts) in [*shard.items()]:
+            acc = ret.setdefault(route, [0, {}])
+            acc[0] += requests
+            [acc[1].__setitem__(f, acc[1].get(f, 0) + n) for f, n in [*checkouts.items()]]
+        return ret
+
+    def _hot(self, route, requests, checkouts):
+        names = {f: k for m in route.shop_fixtures_map.values() for k, f in m.items()}
+        return [
+            names[f] for f, n in [*checkouts.items()]
+            if f in names and n / requests >= self.threshold
+        ]
+
+    def plans(self, app_ctx):
+        ''' Return {route_name: [shop_fixture_name, ...]} of the routes of the mount
+            whose lazy checkouts exceed the threshold.
+        '''
+        stats = self.collect()
+        ret = {}
+        for h in app_ctx.handlers.values():
+            route = h.__route__
+            requests, checkouts = stats.get(route.key, (0, None))
+            if requests < self.min_requests:
+                continue
+            hot = self._hot(route, requests, checkouts)
+            if hot:
+                ret[route.key.name] = hot
+        return ret
+
+    def promote(self, app_ctx):
+        ''' Promote hot fixtures of the mount, return the number of changed routes.'''
+        plans = self.plans(app_ctx)
+        return app_ctx.app.promote_fixtures(app_ctx, plans) if plans else 0
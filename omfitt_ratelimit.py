@@ -0,0 +1,63 @@
+'''Token bucket rate limit per client key.'''
+import threading
+import time
+from collections import OrderedDict
+
+from omfitt import BaseFixture
+
+
+class RateLimited(Exception):
+    ''' Raised by RateLimitFixture.take_on, use Fitter.error(RateLimited) to render 429.'''
+    status = 429
+
+    def __init__(self, key, retry_after):
+        super().__init__(f'Rate limit exceeded for {key!r}')
+        self.key = key
+        self.retry_after = retry_after
+
+
+class RateLimitFixture(BaseFixture):
+    ''' Token bucket rate limiter: `rate` requests per second with `burst` capacity
+        per key returned by `key(app_ctx, ctx)` (default - mount name).
+
+        Buckets are split into lock-striped shards, refilled lazily on access
+        and the least recently used keys are evicted over `max_keys`.
+
+        To reject before expensive fixtures are taken on, place it first:
+        as outer default fixture of the Fitter or as a dependency:
+            db = Database(...); db.use_fixtures(limit)
+    '''
+
+    def __init__(self, rate, burst=None, key=None, shards=16, max_keys=100000, exception=RateLimited):
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self.key = key or (lambda app_ctx, ctx: getattr(app_ctx, 'name', None))
+        self.exception = exception
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+        self._shard_max_keys = max(1, max_keys // shards)
+
+    def take_on(self, app_ctx, ctx):
+        key = self.key(app_ctx, ctx)
+        retry_after = self.consume(key)
+        if retry_after:
+            raise self.exception(key, retry_after)
+
+    def consume(self, key, n=1):
+        ''' Take `n` tokens, return 0 on success or seconds to wait for them.'''
+        lock, buckets = self._shards[hash(key) % len(self._shards)]
+        now = time.monotonic()
+        with lock:
+            # [tokens, last_refill]
+            b = buckets.get(key)
+            if b is None:
+                if len(buckets) >= self._shard_max_keys:
+                    buckets.popitem(last=False)
+                b = buckets[key] = [self.burst, now]
+            else:
+                buckets.move_to_end(key)
+                b[0] = min(self.burst, b[0] + (now - b[1]) * self.rate)
+                b[1] = now
+            if b[0] < n:
+                return (n - b[0]) / self.rate
+            b[0] -= n
+        return 0
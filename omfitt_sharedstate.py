@@ -0,0 +1,70 @@
+'''Counters and records shared between worker processes.'''
+import mmap
+import struct
+import multiprocessing
+
+from omfitt import BaseFixture
+
+
+class SharedStateFixture(BaseFixture):
+    ''' Counters, gauges and fixed-size records shared between
+        worker processes via an anonymous shared mmap.
+
+        Must be created before fork (i.e. at app import time).
+
+        stats = SharedStateFixture(
+            counters=['hits'], gauges=['load'], records={'last': 'dq'}
+        )
+        stats.incr('hits')
+        stats.set('last', time.time(), user_id)
+        stats.get('last')  # -> (ts, user_id)
+
+        Updates are atomic, guarded by `stripes` lock-striped
+        multiprocessing locks.
+    '''
+
+    _counter_struct = struct.Struct('q')
+    _gauge_struct = struct.Struct('d')
+
+    def __init__(self, counters=(), gauges=(), records=None, stripes=16):
+        self._locks = [multiprocessing.Lock() for _ in range(stripes)]
+        self._slots = {}
+        offset = 0
+        fields = [
+            *[(k, 'counter', self._counter_struct) for k in counters],
+            *[(k, 'gauge', self._gauge_struct) for k in gauges],
+            *[(k, 'record', struct.Struct(fmt)) for k, fmt in (records or {}).items()],
+        ]
+        for i, (k, kind, st) in enumerate(fields):
+            if k in self._slots:
+                raise KeyError(f'Name is already in use: {k}')
+            self._slots[k] = (kind, st, offset, self._locks[i % stripes])
+            # keep 8-bytes alignment
+            offset += -(-st.size // 8) * 8
+        self._buf = mmap.mmap(-1, max(offset, 1))
+
+    def incr(self, name, n=1):
+        kind, st, offset, lock = self._slots[name]
+        if kind == 'record':
+            raise TypeError(f'Record `{name}` can\'t be incremented')
+        buf = self._buf
+        with lock:
+            v = st.unpack_from(buf, offset)[0] + n
+            st.pack_into(buf, offset, v)
+        return v
+
+    def set(self, name, *values):
+        kind, st, offset, lock = self._slots[name]
+        if kind == 'counter':
+            raise TypeError(f'Counter `{name}` can\'t be set')
+        with lock:
+            st.pack_into(self._buf, offset, *values)
+
+    def get(self, name):
+        kind, st, offset, lock = self._slots[name]
+        with lock:
+            ret = st.unpack_from(self._buf, offset)
+        return ret if kind == 'record' else ret[0]
+
+    def snapshot(self):
+        return {k: self.get(k) for k in self._slots}
@@ -0,0 +1,130 @@
+'''Slow-request watchdog.'''
+import threading
+import time
+import sys
+import traceback
+from collections import deque
+from types import SimpleNamespace
+
+from omfitt import BaseFixture, BaseInstrument
+
+
+class Watchdog(BaseInstrument):
+    ''' Slow-request watchdog.
+
+        Tracks in-flight requests (just a dict write per request) and
+        from a background thread reports those that exceed `threshold` seconds:
+        route, ctx.phase, the fixture hook being executed and the thread stack.
+        At most `max_reports` reports per `period` seconds are made.
+
+        watchdog = Watchdog(threshold=5, on_slow=lambda r: log.warning(r))
+        processor = BaseProcessor(instruments=[watchdog])
+    '''
+
+    fixture_hooks = ('take_on', 'on_output', 'on_finalize', 'warmup')
+
+    def __init__(self, threshold=5.0, interval=1.0, max_reports=10, period=60.0,
+                 on_slow=None, keep=100, autostart=True):
+        self.threshold = threshold
+        self.interval = interval
+        self.max_reports = max_reports
+        self.period = period
+        self.on_slow = on_slow
+        self.autostart = autostart
+        self.reports = deque(maxlen=keep)
+        # {thread_id: [ctx, start, reported]}
+        self._in_flight = {}
+        self._reported_at = deque()
+        self._thread = None
+        self._stop = threading.Event()
+        # stop() disables autostart
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def on_request(self, ctx):
+        tid = threading.get_ident()
+        # keep the outermost request of the thread
+        if tid not in self._in_flight:
+            self._in_flight[tid] = [ctx, time.monotonic(), False]
+        if self._thread is None and self.autostart and not self._stopped:
+            with self._lock:
+                self._stopped or self._start()
+
+    def on_done(self, ctx):
+        tid = threading.get_ident()
+        rec = self._in_flight.get(tid)
+        if rec is not None and rec[0] is ctx:
+            del self._in_flight[tid]
+
+    def start(self):
+        with self._lock:
+            self._stopped = False
+            self._start()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        # each thread has its own event, so a stopped thread never resumes
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), name='omfitt-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        ''' Stop the background thread and wait for it, autostart is disabled until `start()`.'''
+        with self._lock:
+            self._stopped = True
+            thread, self._thread = self._thread, None
+            self._stop.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+
+    def _run(self, stop):
+        while not stop.wait(self.interval):
+            self.check()
+
+    def _allow_report(self, now):
+        reported_at = self._reported_at
+        while reported_at and reported_at[0] < now - self.period:
+            reported_at.popleft()
+        if len(reported_at) >= self.max_reports:
+            return False
+        reported_at.append(now)
+        return True
+
+    def check(self):
+        ''' Report slow requests, return the list of new reports.'''
+        now = time.monotonic()
+        frames = None
+        ret = []
+        for tid, rec in [*self._in_flight.items()]:
+            ctx, start, reported = rec
+            if reported or now - start < self.threshold:
+                continue
+            if frames is None:
+                frames = sys._current_frames()
+            frame = frames.get(tid)
+            if frame is None:
+                continue
+            if not self._allow_report(now):
+                break
+            rec[2] = True
+            fixture, hook = self._find_fixture(frame)
+            report = SimpleNamespace(
+                thread_id=tid, route=ctx.route, phase=ctx.phase,
+                fixture=fixture, hook=hook, elapsed=now - start,
+                stack=''.join(traceback.format_stack(frame)),
+            )
+            self.reports.append(report)
+            ret.append(report)
+            self.on_slow and self.on_slow(report)
+        return ret
+
+    def _find_fixture(self, frame):
+        hooks = self.fixture_hooks
+        while frame is not None:
+            if frame.f_code.co_name in hooks:
+                obj = frame.f_locals.get('self')
+                if isinstance(obj, BaseFixture):
+                    return obj, frame.f_code.co_name
+            frame = frame.f_back
+        return None, None
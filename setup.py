@@ -26,5 +26,21 @@ setup(
         "Topic :: Software Development :: Libraries :: Python Modules",
     ],
     python_requires='>=3.7',
-    python_modules = ['omfitt']
+    py_modules=[
+        'omfitt',
+        'omfitt_load',
+        'omfitt_groupcommit',
+        'omfitt_sharedstate',
+        'omfitt_metrics',
+        'omfitt_watchdog',
+        'omfitt_flightrecorder',
+        'omfitt_limiter',
+        'omfitt_ratelimit',
+        'omfitt_breaker',
+        'omfitt_profile',
+        'omfitt_alloctracer',
+        'omfitt_cache',
+        'omfitt_offload',
+        'omfitt_gcgateway',
+    ],
 )
@@ -0,0 +1,32 @@
+from omfitt import BaseFixture, BaseAction as _BaseAction
+
+
+class BaseAction(_BaseAction):
+    ''' Routes are declared by path only: @action('/path').'''
+
+    def _parse_action_args(self, args, kw):
+        return args[0], 'GET', None, None, kw
+
+
+class Tracked(BaseFixture):
+    ''' Records its hooks to `log` as "<hook> <name>".
+
+        take_on keeps the request ctx in the fixture local and in ctx.shared_data[name],
+        and appends the name to ctx.shared_data['taken'].
+    '''
+
+    def __init__(self, name, log=None):
+        self.name = name
+        self.log = [] if log is None else log
+
+    def take_on(self, app_ctx, ctx):
+        self._safe_local = ctx
+        ctx.shared_data[self.name] = ctx
+        ctx.shared_data.setdefault('taken', []).append(self.name)
+        self.log.append(f'take_on {self.name}')
+
+    def on_output(self, app_ctx, ctx):
+        self.log.append(f'on_output {self.name}')
+
+    def on_finalize(self, app_ctx, ctx):
+        self.log.append(f'finalize {self.name}')
@@ -0,0 +1,75 @@
+import tracemalloc
+from omfitt import BaseFixture, BaseProcessor, FixtureService, FixtureShop
+from omfitt_alloctracer import AllocationTracer
+
+LEAKED = []
+
+
+class Leaky(BaseFixture):
+    def take_on(self, app_ctx, ctx):
+        LEAKED.append(bytearray(100_000))
+
+
+class Balanced(BaseFixture):
+    def take_on(self, app_ctx, ctx):
+        self._safe_local = bytearray(50_000)
+
+    def on_finalize(self, app_ctx, ctx):
+        self._safe_local = None
+
+
+def make_handler(tracer, core, fixtures, shop=None):
+    fs = FixtureService()
+    shop and fs.serve(shop)
+    return BaseProcessor(instruments=[tracer]).make_core_handler(
+        core, None, fs, fixtures, {shop: shop.fixtures} if shop else {},
+        {'app_ctx': {}, 'staff_ctx': {}}
+    )
+
+
+def test_attribution():
+    LEAKED.clear()
+    tracer = AllocationTracer(rate=1.0)
+    leaky_ = Leaky()
+    balanced = Balanced()
+
+    @FixtureShop.make_from
+    class Shop:
+        leaky = leaky_
+
+    def core(fail=False):
+        LEAKED.append(bytearray(20_000))
+        Shop.leaky
+        if fail:
+            raise ValueError()
+        return 'ok'
+
+    h = make_handler(tracer, core, [balanced], Shop)
+    BaseFixture.__init_request_ctx__()
+    for _ in range(5):
+        h()
+    try:
+        h(True)
+    except ValueError:
+        pass
+    assert not tracemalloc.is_tracing()
+    top = tracer.top(3)
+    assert [r.fixture for r in top] == [leaky_, None, balanced]
+    leaky, core_rec, balanced_rec = top
+    assert 100_000 <= leaky.per_request < 110_000
+    assert 20_000 <= core_rec.per_request < 30_000
+    assert [*core_rec.hooks] == ['core']
+    assert abs(balanced_rec.size) < 5_000
+    assert balanced_rec.hooks['take_on'] >= 50_000 * 6
+    assert len(tracer.top(1)) == 1
+    tracer.reset()
+    assert tracer.top() == []
+
+
+def test_sampling():
+    tracer = AllocationTracer(rate=0.0)
+    h = make_handler(tracer, lambda: LEAKED.append(bytearray(1000)), [Leaky()])
+    BaseFixture.__init_request_ctx__()
+    [h() for _ in range(10)]
+    assert tracer.top() == []
+    LEAKED.clear()
@@ -0,0 +1,134 @@
+import pytest
+from omfitt import BaseFixture, FixtureService, BaseProcessor, FixtureShop, Fitter, BaseApp, ShortCircuit
+from conftest import BaseAction, Tracked
+
+
+class Tagging(Tracked):
+    def on_output(self, app_ctx, ctx):
+        super().on_output(app_ctx, ctx)
+        if isinstance(ctx.output, list):
+            ctx.output.append(self.name)
+
+
+class App(BaseApp):
+    name = 'app'
+
+
+def test_batch():
+    log = []
+    db = db_ = Tagging('db', log)
+    auth = Tagging('auth', log)
+    cache_ = Tagging('cache', log)
+
+    @FixtureShop.make_from
+    class Shop:
+        db = db_
+        cache = cache_
+
+    proc = BaseProcessor()
+    fitter = Fitter(proc, FixtureService(), [Shop])
+    fitter.exception_handlers[KeyError] = lambda app_ctx, ctx, ex: ['not found']
+    action = BaseAction(fitter)
+
+    @action('/get')
+    @action.uses(db, auth)
+    def get(i, mul=1):
+        assert proc.ctx.shared_data['taken'] == ['db', 'auth']
+        return [i * mul]
+
+    @action('/cached')
+    @action.uses(auth)
+    def cached(i):
+        return [Shop.cache.name, i]
+
+    @action('/fail')
+    @action.uses(db)
+    def fail(ex):
+        raise ex
+
+    @action('/redirect')
+    @action.uses(db)
+    def redirect():
+        return ShortCircuit('/login')
+
+    app = App(action)
+    app_ctx = app.mount()
+    BaseFixture.__init_request_ctx__()
+    res = app.batch(app_ctx, [
+        (get, (1,)),
+        (get, (2,), {'mul': 10}),
+        (cached, (3,)),
+        (cached, (4,)),
+        (fail, (KeyError(),)),
+        (fail, (ValueError('boom'),)),
+        (redirect,),
+    ])
+    assert [r.output for r in res] == [
+        [1, 'auth', 'db'], [20, 'auth', 'db'],
+        # on_output of the route fixtures and the checked out ones only
+        ['cache', 3, 'cache', 'auth'], ['cache', 4, 'cache', 'auth'],
+        ['not found'], None, '/login',
+    ]
+    assert [type(r.exception) for r in res] == [type(None)] * 5 + [ValueError, type(None)]
+    assert isinstance(res[4].ctx.exception, KeyError) and not res[4].ctx.successful
+    assert log[:2] == ['take_on db', 'take_on auth']
+    assert log.count('take_on cache') == 1
+    assert log.count('finalize db') == 1
+    assert log[-3:] == ['finalize cache', 'finalize auth', 'finalize db']
+    # get items, failed and short-circuited items skip on_output
+    assert log.count('on_output db') == 2
+    assert log.count('on_output cache') == 2
+    assert proc.batch([]) == []
+
+
+class Title(BaseFixture):
+    def on_output(self, app_ctx, ctx):
+        ctx.output = ctx.output.upper()
+
+
+def test_batch_output_of_item_fixtures():
+    action = BaseAction(Fitter(BaseProcessor(), FixtureService(), []))
+
+    @action('/a')
+    @action.uses(Title())
+    def a():
+        return 'a-route'
+
+    @action('/b')
+    def b():
+        return 'b-route must stay lowercase'
+
+    app = App(action)
+    app_ctx = app.mount()
+    BaseFixture.__init_request_ctx__()
+    res = app.batch(app_ctx, [(a,), (b,)])
+    assert [r.output for r in res] == ['A-ROUTE', 'b-route must stay lowercase']
+
+
+def test_batch_ctx_pool():
+    proc = BaseProcessor(ctx_pool=4)
+    action = BaseAction(Fitter(proc, FixtureService(), []))
+
+    @action('/a')
+    def a(i):
+        proc.ctx.shared_data[i] = i
+        return i
+
+    app = App(action)
+    app_ctx = app.mount()
+    BaseFixture.__init_request_ctx__()
+    res = app.batch(app_ctx, [(a, (1,)), (a, (2,))])
+    # the items share shared_data of the batch context
+    assert res[0].ctx.shared_data == {1: 1, 2: 2}
+    res = app.batch(app_ctx, [(a, (3,))])
+    assert res[0].ctx.shared_data == {3: 3}
+
+
+def test_batch_fs():
+    proc = BaseProcessor()
+    h1, h2 = [
+        proc.make_core_handler(lambda: 1, None, FixtureService(), [], {}, {'app_ctx': {}, 'staff_ctx': {}})
+        for _ in range(2)
+    ]
+    with pytest.raises(ValueError):
+        proc.batch([(h1,), (h2,)])
@@ -0,0 +1,99 @@
+import pytest
+import omfitt_breaker
+from omfitt import BaseFixture, FixtureService, BaseProcessor, Fitter
+from conftest import BaseAction
+from omfitt_breaker import CircuitBreaker, CircuitOpen, CircuitState
+
+
+class Conn(BaseFixture):
+    def __init__(self):
+        self.down = False
+        self.calls = []
+
+    def connect(self):
+        return 'conn'
+
+    def warmup(self, app_ctx):
+        self.calls.append('warmup')
+
+    def take_on(self, app_ctx, ctx):
+        self.calls.append('take_on')
+        if self.down:
+            raise ConnectionError()
+
+    def on_finalize(self, app_ctx, ctx):
+        self.calls.append('on_finalize')
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(omfitt_breaker.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_breaker(clock):
+    conn = Conn()
+    breaker = CircuitBreaker(conn, failures=2, window=10, reset_timeout=5)
+    assert breaker.connect() == 'conn'
+
+    def core():
+        return 'ok'
+    handler = BaseProcessor().make_core_handler(
+        core, None, FixtureService(), [breaker], {},
+        {'app_ctx': {}, 'staff_ctx': {}},
+        {CircuitOpen: lambda app_ctx, ctx, ex: 'open', ConnectionError: lambda app_ctx, ctx, ex: 'down'}
+    )
+    BaseFixture.__init_request_ctx__()
+    assert handler() == 'ok'
+    assert conn.calls == ['take_on', 'on_finalize']
+
+    conn.down = True
+    conn.calls.clear()
+    assert [handler(), handler()] == ['down', 'down']
+    assert breaker.state is CircuitState.OPEN
+    assert handler() == 'open'
+    assert conn.calls == ['take_on', 'take_on']
+    assert breaker.stats()['rejected'] == 1
+
+    # failed probe
+    clock[0] += 5
+    assert handler() == 'down'
+    assert breaker.state is CircuitState.OPEN
+    assert handler() == 'open'
+
+    # successful probe
+    conn.down = False
+    clock[0] += 5
+    assert handler() == 'ok'
+    assert breaker.state is CircuitState.CLOSED
+    assert handler() == 'ok'
+
+
+def test_window(clock):
+    conn = Conn()
+    breaker = CircuitBreaker(conn, failures=2, window=10)
+    breaker._on_failure()
+    clock[0] += 11
+    breaker._on_failure()
+    assert breaker.state is CircuitState.CLOSED
+    breaker._on_failure()
+    assert breaker.state is CircuitState.OPEN
+    assert conn.with_deps.keys() == {conn}
+    assert [*breaker.with_deps] == [breaker]
+
+
+def test_warmup_deps():
+    conn, pool = Conn(), Conn()
+    breaker = CircuitBreaker(conn)
+    breaker.use_fixtures(pool)
+    assert conn.__prerequisites__ == []
+    action = BaseAction(Fitter(BaseProcessor(), FixtureService(), []))
+
+    @action('/x')
+    @action.uses(breaker)
+    def core():
+        pass
+    report = action.warmup_fixtures(None)
+    assert set(report) == {breaker, pool}
+    assert conn.calls == pool.calls == ['warmup']
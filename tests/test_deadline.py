@@ -0,0 +1,57 @@
+import time
+from omfitt import BaseFixture, FixtureService, BaseProcessor, Fitter, DeadlineGateway, DeadlineExceeded, RouteContext
+from conftest import BaseAction, Tracked
+
+
+class Slow(Tracked):
+    def __init__(self, name, log, delay=0):
+        super().__init__(name, log)
+        self.delay = delay
+        self.remaining = None
+
+    def take_on(self, app_ctx, ctx):
+        super().take_on(app_ctx, ctx)
+        self.remaining = ctx.remaining()
+        time.sleep(self.delay)
+
+
+def test_deadline_stops_setup():
+    log = []
+    foo = Slow('foo', log)
+    slow = Slow('slow', log, 0.1)
+    bar = Slow('bar', log)
+    fitter = Fitter(
+        BaseProcessor(), FixtureService(), [],
+        gateways=[DeadlineGateway(10, lambda ctx: ctx.shared_data.get('timeout', 0.05))]
+    )
+    fitter.error(DeadlineExceeded, lambda app_ctx, ctx, ex: 'timeout')
+    action = BaseAction(fitter)
+
+    @action('/')
+    @action.uses(foo, slow, bar)
+    def core():
+        log.append('core')
+        return 'ok'
+
+    [(handler, _)] = action.make_handlers({}, None)
+    BaseFixture.__init_request_ctx__()
+    assert handler() == 'timeout'
+    assert 0 < foo.remaining <= 0.05
+    assert log == ['take_on foo', 'take_on slow', 'finalize slow', 'finalize foo']
+
+
+def test_set_timeout():
+    ctx = RouteContext()
+    assert ctx.remaining() is None
+    ctx.check_deadline()
+    ctx.set_timeout(10)
+    ctx.set_timeout(20)
+    assert 9 < ctx.remaining() <= 10
+    ctx.set_timeout(0)
+    assert ctx.remaining() == 0
+    try:
+        ctx.check_deadline()
+    except DeadlineExceeded:
+        pass
+    else:
+        assert False
@@ -1,14 +1,10 @@
 
 import pytest
-from omfitt import BaseFixture, FixtureService, BaseProcessor, FixtureShop, Fitter, BaseAction as _BaseAction
+from omfitt import BaseFixture, FixtureService, BaseProcessor, FixtureShop, Fitter
+from conftest import BaseAction
 from unittest.mock import MagicMock
 
 
-class BaseAction(_BaseAction):
-    def _parse_action_args(self, args, kw):
-        return args[0], 'GET', None, None, kw
-
-
 class Proc(BaseProcessor):
     __slots__ = BaseProcessor.__slots__
 
@@ -167,3 +163,67 @@ def test_action(handlers, arg: MagicMock):
     res = handlers['/bar'](arg)
     arg.assert_called_with('barcore')
     assert res == ['/bar', 'baz', 'foo']
+
+
+class SlowWarm(BaseFixture):
+    def __init__(self, delay):
+        self.delay = delay
+        self.warmed = 0
+
+    def warmup(self, app_ctx):
+        import time
+        time.sleep(self.delay)
+        self.warmed += 1
+        if self.delay < 0:
+            raise ValueError()
+
+
+def test_warmup_fixtures():
+    from omfitt import BaseApp
+    a, b, c = SlowWarm(0.1), SlowWarm(0.1), SlowWarm(0.1)
+    b.use_fixtures(a)
+
+    @FixtureShop.make_from
+    class Shop:
+        aa = a
+        cc = c
+
+    fitter = Fitter(Proc(), FixtureService(), [Shop])
+    action = BaseAction(fitter)
+
+    @action('/b')
+    @action.uses(b)
+    def core():
+        pass
+
+    class App(BaseApp):
+        warmup_on_mount = True
+        warmup_workers = 3
+        name = 'app'
+
+    import time
+    t0 = time.perf_counter()
+    app = App(action)
+    app_ctx = app.mount('first')
+    assert time.perf_counter() - t0 < 0.25
+    report = app_ctx.warmup_report
+    assert set(report) == {a, b, c}
+    assert all(r.duration >= 0.1 and r.error is None for r in report.values())
+    # dedup across mounts
+    assert app.mount('second').warmup_report == {}
+    assert [a.warmed, b.warmed, c.warmed] == [1, 1, 1]
+
+
+def test_warmup_timeout_error():
+    slow, bad = SlowWarm(0.3), SlowWarm(-1)
+    fitter = Fitter(Proc(), FixtureService(), [])
+    action = BaseAction(fitter)
+
+    @action('/x')
+    @action.uses(slow, bad)
+    def core():
+        pass
+
+    report = action.warmup_fixtures(None, timeout=0.1)
+    assert isinstance(report[slow].error, TimeoutError)
+    assert isinstance(report[bad].error, ValueError)
@@ -57,3 +57,19 @@ def test_backdoor(shop, foo_bar):
     shop.close_backdoor()
     assert shop.bar is bar
     assert cb.called
+
+
+def test_checkout_memo(shop, foo_bar):
+    foo, bar = foo_bar
+    cb = MagicMock()
+    shop.on_checkout(cb)
+    shop.open(None)
+    assert [shop.foo for _ in range(100)] == [foo] * 100
+    assert shop.bar is bar
+    assert cb.call_count == 2
+    shop.close()
+    with pytest.raises(RuntimeError):
+        shop.foo
+    shop.open(None)
+    assert shop.foo is foo
+    assert cb.call_count == 3
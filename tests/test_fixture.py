@@ -1,6 +1,6 @@
 import pytest
 import types
-from omfitt import BaseFixture
+from omfitt import BaseFixture, SlottedFixture
 
 
 class Foo(BaseFixture):
@@ -54,3 +54,31 @@ def test_local_err():
     with pytest.raises(RuntimeError) as err:
         foo._safe_local.a
     assert 'fitter hint' in str(err.value)
+
+
+class SlottedBar(SlottedFixture):
+    __slots__ = ('foo',)
+
+    def __init__(self, foo):
+        self.foo = foo
+
+
+def test_slotted():
+    sbar = SlottedBar(foo)
+    assert not hasattr(sbar, '__dict__')
+    assert sbar.__prerequisites__ == (foo,)
+    assert sbar.use_fixtures(bar) is bar
+    assert sbar.use_fixtures(foo, bar) == (foo, bar)
+    assert sbar.__prerequisites__ == (foo, bar)
+    assert [*sbar.with_deps] == [foo, bar, sbar]
+    with pytest.raises(AttributeError):
+        sbar.baz = 1
+
+
+@pytest.mark.parametrize('base', [dict, list, Exception])
+def test_builtin_mixin(base):
+    cls = type('X', (BaseFixture, base), {})
+    x = cls()
+    assert x.use_fixtures(foo) is foo
+    assert '__prerequisites__' in x.__dict__
+    assert isinstance(BaseFixture(), BaseFixture)
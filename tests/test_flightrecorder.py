@@ -0,0 +1,66 @@
+import pytest
+from omfitt import BaseFixture, FixtureService, BaseProcessor, ProcessPhase
+from omfitt_flightrecorder import FlightRecorder
+
+
+class Fixture(BaseFixture):
+    def __init__(self, fail_on=None):
+        self.fail_on = fail_on
+
+    def take_on(self, app_ctx, ctx):
+        if self.fail_on == 'take_on':
+            raise ValueError()
+
+    def on_finalize(self, app_ctx, ctx):
+        if self.fail_on == 'on_finalize':
+            raise KeyError()
+
+
+def make_handler(recorder, *fixtures):
+    proc = BaseProcessor(instruments=[recorder])
+
+    def core():
+        return []
+    return proc.make_core_handler(
+        core, None, FixtureService(), list(fixtures), {}, {'app_ctx': {}, 'staff_ctx': {}}
+    )
+
+
+def test_timeline():
+    foo, bar = Fixture(), Fixture()
+    recorder = FlightRecorder(size=4)
+    handler = make_handler(recorder, foo, bar)
+    handler()
+    [rec] = recorder.dump()
+    assert rec['route'].name == 'make_handler.<locals>.core'
+    assert rec['exception'] is None
+    assert rec['duration'] > 0
+    S, R, O, F = ProcessPhase
+    assert [(e['fixture'], e['hook'], e['phase']) for e in rec['events']] == [
+        (None, 'phase', S), (foo, 'take_on', S), (bar, 'take_on', S),
+        (None, 'phase', R), (None, 'phase', O),
+        (bar, 'on_output', O), (foo, 'on_output', O),
+        (None, 'phase', F),
+        (bar, 'on_finalize', F), (foo, 'on_finalize', F),
+    ]
+    assert all(e['start'] <= e['end'] for e in rec['events'])
+
+
+def test_ring_and_errors():
+    errors = []
+    recorder = FlightRecorder(size=3, max_events=4, on_error=errors.append)
+    handler = make_handler(recorder, Fixture(), Fixture('take_on'))
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            handler()
+    dump = recorder.dump()
+    assert [r['seq'] for r in dump] == [2, 3, 4]
+    assert [r['seq'] for r in recorder.dump(2)] == [3, 4]
+    assert len(dump[0]['events']) == 4
+    assert dump[0]['events'][2]['error'] == 'ValueError'
+    assert dump[0]['exception'] == 'ValueError'
+    assert len(errors) == 5
+
+    recorder = FlightRecorder(on_error=errors.append)
+    make_handler(recorder, Fixture('on_finalize'))()
+    assert errors[-1]['finalize_errors'] == 1
@@ -0,0 +1,71 @@
+import gc
+import time
+from omfitt import BaseFixture, BaseProcessor, FixtureService, RouteContext
+from omfitt_gcgateway import GCGateway
+from omfitt_metrics import Metrics
+
+
+class Node:
+    def __init__(self):
+        self.ref = self
+
+
+def make_cycles(n):
+    [Node() for _ in range(n)]
+    return gc.isenabled()
+
+
+def test_gc_gateway():
+    assert gc.isenabled()
+    gw = GCGateway(thresholds=(100, 2, 2), max_pending=1000, idle=0.05)
+    # started by the first request
+    assert gc.isenabled()
+    try:
+        metrics = Metrics()
+        h = BaseProcessor(instruments=[metrics]).make_core_handler(
+            make_cycles, gw, FixtureService(), [], {}, {'app_ctx': {}, 'staff_ctx': {}}
+        )
+        BaseFixture.__init_request_ctx__()
+        assert h(500) is False
+        # collected in background after the request
+        deadline = time.monotonic() + 2
+        while not sum(gw.collections) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert sum(gw.collections) and not gw.forced
+        assert gc.get_count()[0] < 100
+
+        # under constant load the request pays for the collection
+        other = RouteContext()
+        gw.setup({}, other)
+        try:
+            before = gw.stats()
+            h(2000)
+            assert gw.forced == 1
+            assert gw.stats().pause_total > before.pause_total
+        finally:
+            gw.cleanup({}, other)
+        st, = metrics.collect().values()
+        pause, n = st.observed['gc_pause_seconds']
+        # the background collection is not paid by the request
+        assert n == 2 and 0 < pause <= gw.stats().pause_total - before.pause_total
+        assert '_gc_pause_seconds_sum{' in metrics.render()
+    finally:
+        gw.close()
+    assert gc.isenabled()
+    assert gw._on_gc not in gc.callbacks
+    # no autostart after close()
+    h(10)
+    assert gc.isenabled()
+
+
+def test_idle_collection():
+    gw = GCGateway(thresholds=(100000, 10, 10), idle=0.02)
+    gw.start()
+    try:
+        [Node() for _ in range(50)]
+        deadline = time.monotonic() + 2
+        while not gw.collections[0] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert gw.collections[0]
+    finally:
+        gw.close()
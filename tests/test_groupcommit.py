@@ -0,0 +1,91 @@
+import threading
+import pytest
+from omfitt import BaseFixture, RouteContext
+from omfitt_groupcommit import GroupCommitFixture
+
+
+class Hits(GroupCommitFixture):
+    def __init__(self, fail=False, **kw):
+        super().__init__(**kw)
+        self.fail = fail
+        self.batches = []
+
+    def commit_batch(self, items):
+        if self.fail:
+            raise RuntimeError('db is down')
+        self.batches.append(items)
+
+
+def run_request(fixture, *items, successful=True):
+    BaseFixture.__init_request_ctx__()
+    ctx = RouteContext()
+    ctx.successful = successful
+    fixture.take_on({}, ctx)
+    fixture.write(*items)
+    fixture.on_finalize({}, ctx)
+
+
+def test_coalesce_concurrent_requests():
+    hits = Hits(max_batch=1000, window=0.05, durable=True)
+    threads = [
+        threading.Thread(target=run_request, args=(hits, i))
+        for i in range(20)
+    ]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    assert sorted(sum(hits.batches, [])) == list(range(20))
+    assert len(hits.batches) < 20
+
+
+def test_flush_by_size():
+    hits = Hits(max_batch=2, window=10, durable=True, timeout=5)
+    run_request(hits, 'a', 'b')
+    assert hits.batches == [['a', 'b']]
+
+
+def test_skip_unsuccessful():
+    hits = Hits(window=0, durable=True)
+    run_request(hits, 'a', successful=False)
+    hits.flush()
+    assert hits.batches == []
+
+
+def test_durable_error():
+    hits = Hits(fail=True, window=0, durable=True)
+    with pytest.raises(RuntimeError):
+        run_request(hits, 'a')
+
+
+def test_flush():
+    hits = Hits(window=10)
+    run_request(hits, 'a')
+    hits.flush()
+    assert hits.batches == [['a']]
+
+
+def test_commit_error_hook_fails(capsys):
+    called = threading.Event()
+
+    class Broken(Hits):
+        def on_commit_error(self, items, ex):
+            called.set()
+            raise ValueError('hook is broken')
+
+    hits = Broken(fail=True, window=0)
+    run_request(hits, 'a')
+    assert called.wait(5)
+    hits.fail = False
+    hits.durable = True
+    hits.timeout = 5
+    run_request(hits, 'b')
+    assert hits.batches == [['b']]
+    assert 'hook is broken' in capsys.readouterr().err
+
+
+def test_commit_callable():
+    committed = []
+    hits = GroupCommitFixture(window=0, durable=True, timeout=5, commit=committed.append)
+    run_request(hits, 'a')
+    assert committed == [['a']]
+    with pytest.raises(TypeError):
+        GroupCommitFixture()
@@ -0,0 +1,116 @@
+import threading
+import time
+import pytest
+from omfitt import BaseFixture, FixtureService, BaseProcessor, Fitter, GatewayChain, BaseGateway
+from conftest import BaseAction
+from omfitt_limiter import ConcurrencyLimiter, Overloaded
+
+
+@pytest.fixture
+def gate():
+    return threading.Event()
+
+
+# RouteKey.name is the qualified name of the core function
+LOCALS = 'handlers.<locals>.'
+
+
+@pytest.fixture
+def limiter():
+    return ConcurrencyLimiter(
+        limit=2, route_limits={LOCALS + 'slow': 1}, queue_size=1, timeout=0.2, bypass=[LOCALS + 'health']
+    )
+
+
+@pytest.fixture
+def handlers(limiter, gate):
+    fitter = Fitter(BaseProcessor(), FixtureService(), [], gateways=[limiter])
+    action = BaseAction(fitter)
+
+    @action('slow')
+    def slow():
+        gate.wait(5)
+        return 'slow'
+
+    @action('fast')
+    def fast():
+        return 'fast'
+
+    @action('health')
+    def health():
+        return 'ok'
+
+    fitter.error(Overloaded, lambda app_ctx, ctx, ex: '503')
+    return {meta.route_args[0][0]: h for h, meta in action.make_handlers({}, None)}
+
+
+def call_in_thread(h, results):
+    def run():
+        BaseFixture.__init_request_ctx__()
+        results.append(h())
+    t = threading.Thread(target=run)
+    t.start()
+    return t
+
+
+def test_route_limit_and_queue(handlers, limiter, gate):
+    results = []
+    t1 = call_in_thread(handlers['slow'], results)
+    time.sleep(0.05)
+    # queued
+    t2 = call_in_thread(handlers['slow'], results)
+    time.sleep(0.05)
+    assert limiter.stats()['*'] == (1, 0)
+    # queue is full - rejected immediately
+    BaseFixture.__init_request_ctx__()
+    t0 = time.perf_counter()
+    assert handlers['slow']() == '503'
+    assert time.perf_counter() - t0 < 0.1
+    # other routes are not affected by the route limit
+    assert handlers['fast']() == 'fast'
+    assert handlers['health']() == 'ok'
+    t2.join()
+    # queued request is timed out
+    assert results == ['503']
+    gate.set()
+    t1.join()
+    assert results == ['503', 'slow']
+    assert limiter.stats()['*'] == (0, 0)
+
+
+def test_global_limit_bypass(limiter, handlers, gate):
+    limiter._route_limits.clear()
+    limiter._route_slots.clear()
+    results = []
+    threads = [call_in_thread(handlers['slow'], results) for _ in range(2)]
+    time.sleep(0.05)
+    BaseFixture.__init_request_ctx__()
+    assert handlers['health']() == 'ok'
+    gate.set()
+    [t.join() for t in threads]
+    assert results == ['slow', 'slow']
+
+
+class Gw(BaseGateway):
+    def __init__(self, name, log, fail=False):
+        self.name, self.log, self.fail = name, log, fail
+
+    def setup(self, app_ctx, route_ctx):
+        if self.fail:
+            raise Overloaded()
+        self.log.append(('setup', self.name))
+
+    def cleanup(self, app_ctx, route_ctx):
+        self.log.append(('cleanup', self.name))
+
+
+def test_gateway_chain():
+    log = []
+    chain = GatewayChain(Gw('a', log), Gw('b', log))
+    chain.setup(None, None)
+    chain.cleanup(None, None)
+    assert log == [('setup', 'a'), ('setup', 'b'), ('cleanup', 'b'), ('cleanup', 'a')]
+    log.clear()
+    with pytest.raises(Overloaded):
+        GatewayChain(Gw('a', log), Gw('b', log, fail=True)).setup(None, None)
+    assert log == [('setup', 'a'), ('cleanup', 'a')]
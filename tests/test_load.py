@@ -0,0 +1,75 @@
+import time
+import pytest
+import omfitt_load
+from omfitt import FixtureService, BaseProcessor, FixtureShop, Fitter, BaseApp
+from conftest import BaseAction, Tracked
+
+
+MISMATCHED = []
+
+
+class App(BaseApp):
+    name = 'app'
+
+
+@pytest.fixture
+def app():
+    MISMATCHED.clear()
+    foo, bar = Tracked('foo'), Tracked('bar')
+
+    @FixtureShop.make_from
+    class Shop:
+        baz = Tracked('baz')
+
+    proc = BaseProcessor()
+    action = BaseAction(Fitter(proc, FixtureService(), [Shop]))
+
+    @action('/foo')
+    @action.uses(foo, bar)
+    def core():
+        Shop.baz
+        # let other threads interleave
+        time.sleep(0.0001)
+        # the fixture local must belong to the same request
+        if foo._safe_local is not proc.ctx:
+            MISMATCHED.append(proc.ctx)
+        return []
+
+    @action('/fail')
+    def fail():
+        time.sleep(0.0001)
+        raise KeyError()
+
+    @action.fitter.error(KeyError)
+    def on_key_error(app_ctx, ctx, ex):
+        # ctx must belong to the same request
+        if ctx.exception is not ex:
+            MISMATCHED.append(ctx)
+        raise ex
+
+    return App(action)
+
+
+@pytest.mark.parametrize('mode', ['thread', 'asyncio'])
+def test_run(app, mode):
+    app_ctx = app.mount()
+    res = omfitt_load.run(app_ctx, threads=8, requests=400, mode=mode)
+    assert res.requests == 400
+    assert res.errors == {'KeyError': 200}
+    assert not MISMATCHED
+    assert res.throughput > 0
+    assert res.latency.p50 <= res.latency.p99 <= res.latency.max
+    # prefilled at mount, the lazy checkout of Shop.baz is a read
+    assert res.contention.deps_cache_writes == 0
+    assert 'throughput' in omfitt_load.format_result(res)
+
+
+def test_main(app, capsys, monkeypatch):
+    import sys
+    import types
+    mod = types.ModuleType('load_target_mod')
+    mod.app = app
+    monkeypatch.setitem(sys.modules, 'load_target_mod', mod)
+    omfitt_load.main(['load_target_mod', '-t', '1', '2', '-n', '10'])
+    out = capsys.readouterr().out
+    assert out.count('throughput') == 2
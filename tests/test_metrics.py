@@ -0,0 +1,77 @@
+import threading
+import pytest
+from omfitt import BaseFixture, FixtureService, BaseProcessor, ProcessPhase, RouteKey
+from omfitt_metrics import Metrics
+
+
+class Fixture(BaseFixture):
+    def take_on(self, app_ctx, ctx):
+        self._safe_local = {}
+
+
+@pytest.fixture
+def metrics():
+    return Metrics()
+
+
+@pytest.fixture
+def handler(metrics):
+    proc = BaseProcessor(instruments=[metrics])
+
+    def core(fail=False):
+        if fail:
+            raise KeyError()
+        return 'ok'
+    return proc.make_core_handler(
+        core, None, FixtureService(), [Fixture()], {}, {'app_ctx': {}, 'staff_ctx': {}}
+    )
+
+
+def run(handler, n, fail=False):
+    BaseFixture.__init_request_ctx__()
+    for _ in range(n):
+        try:
+            handler(fail)
+        except KeyError:
+            pass
+
+
+def test_collect(metrics, handler):
+    threads = [threading.Thread(target=run, args=(handler, 10, i == 0)) for i in range(4)]
+    [t.start() for t in threads]
+    [t.join() for t in threads]
+    data = metrics.collect()
+    key = RouteKey(None, 'handler.<locals>.core')
+    assert [*data] == [key]
+    st = data[key]
+    assert st.requests == 40
+    assert st.in_flight == 0
+    assert st.errors == {'KeyError': 10}
+    assert st.phases[ProcessPhase.SETUP][1] == 40
+    assert st.phases[ProcessPhase.FINALIZE][1] == 30
+    assert st.duration[1] == 40
+
+
+def test_thread_per_request(metrics, handler):
+    for i in range(200):
+        t = threading.Thread(target=run, args=(handler, 1))
+        t.start()
+        t.join()
+    # shards of the finished threads are folded into the base
+    assert len(metrics._shards) <= 1
+    st, = metrics.collect().values()
+    assert st.requests == 200
+    assert st.phases[ProcessPhase.RUN][1] == 200
+
+
+def test_render(metrics, handler):
+    run(handler, 2)
+    run(handler, 1, fail=True)
+    text = metrics.render()
+    lb = 'app="",route="handler.<locals>.core"'
+    assert f'omfitt_requests_total{{{lb}}} 3' in text
+    assert f'omfitt_errors_total{{{lb},exception="KeyError"}} 1' in text
+    assert f'omfitt_in_flight{{{lb}}} 0' in text
+    assert f'omfitt_phase_seconds_count{{{lb},phase="run"}} 3' in text
+    assert '# TYPE omfitt_request_seconds summary' in text
+    assert Metrics._labels(x='a"b\\c\n') == 'x="a\\"b\\\\c\\n"'
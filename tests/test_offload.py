@@ -0,0 +1,95 @@
+import concurrent.futures
+import os
+import threading
+import time
+import pytest
+from omfitt import (
+    BaseFixture, BaseProcessor, FixtureService, Provided, DeadlineExceeded
+)
+from omfitt_offload import offload
+
+executor = concurrent.futures.ProcessPoolExecutor(2)
+
+
+def teardown_module():
+    executor.shutdown()
+
+
+class Rows(BaseFixture):
+    def __init__(self):
+        self.log = []
+
+    def take_on(self, app_ctx, ctx):
+        self.log.append(('take_on', os.getpid()))
+        ctx.provide('rows', [1, 2, 3])
+
+    def on_output(self, app_ctx, ctx):
+        self.log.append(('on_output', os.getpid()))
+
+    def on_finalize(self, app_ctx, ctx):
+        self.log.append(('on_finalize', os.getpid()))
+
+
+@offload(executor, shm_threshold=1000)
+def report(size, rows=Provided('rows')):
+    return os.getpid(), sum(rows), size and b'x' * size
+
+
+@offload(executor)
+def lock_arg(lock):
+    return lock
+
+
+@offload(executor)
+def slow():
+    time.sleep(0.5)
+    return b'late' * 1_000_000
+
+
+def make_handler(fun, fixtures=(), deadline=None):
+    class Proc(BaseProcessor):
+        __slots__ = ()
+
+        def init_context(self):
+            deadline and self.ctx.set_timeout(deadline)
+    return Proc().make_core_handler(
+        fun, None, FixtureService(), [*fixtures], {}, {'app_ctx': {}, 'staff_ctx': {}}
+    )
+
+
+def test_offload():
+    rows = Rows()
+    h = make_handler(report, [rows])
+    BaseFixture.__init_request_ctx__()
+    pid, total, data = h(0)
+    assert pid != os.getpid()
+    assert total == 6 and data == 0
+    assert rows.log == [(hook, os.getpid()) for hook in ['take_on', 'on_output', 'on_finalize']]
+    # via shared memory
+    assert h(5000)[2] == b'x' * 5000
+    assert h(10)[2] == b'x' * 10
+
+
+def test_offload_errors():
+    BaseFixture.__init_request_ctx__()
+    with pytest.raises(TypeError):
+        make_handler(lock_arg)(threading.Lock())
+
+    with pytest.raises(TypeError):
+        @offload(executor)
+        def local():
+            pass
+
+    with pytest.raises(DeadlineExceeded):
+        make_handler(slow, deadline=0.05)()
+
+
+def test_default_executor(monkeypatch):
+    import omfitt_offload
+    monkeypatch.setattr(omfitt_offload, '_offload_executor', None)
+    pool = omfitt_offload._default_offload_executor()
+    try:
+        assert pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+        assert pool.submit(os.getpid).result(timeout=30) != os.getpid()
+    finally:
+        pool.shutdown()
@@ -233,3 +233,154 @@ def test_process_err(fx_proc: Proc, handler, foo_bar_baz, fx_service: FixtureSer
         # break at init-flow, so no run at all,
         # but baz touched while running core-handler
         assert 'baz' not in ctx.shared_data
+
+
+@pytest.mark.parametrize(
+    'foo_bar_baz',
+    [[('foo', False), ('bar', False), ('baz', False)]],
+    indirect=['foo_bar_baz']
+)
+def test_inject(fx_proc: Proc, foo_bar_baz, shop, fx_service):
+    from omfitt import Ctx, Provided, Use
+    foo_, bar_, baz_ = foo_bar_baz
+
+    class Provider(Fixture):
+        def take_on(self, app_ctx, ctx):
+            super().take_on(app_ctx, ctx)
+            ctx.provide('user', 'joe')
+
+    class MyCtx(Ctx):
+        def make_ctx(self, app_ctx, request, response):
+            return 'my-ctx'
+
+    provider = Provider('provider')
+    seen = {}
+
+    def core(arg=None, *, ctx=Ctx(), my=MyCtx(), user=Provided(), roles=Provided('roles', ()),
+             baz=Use('baz'), prov=Use(provider)):
+        ctx.user = 'joe'
+        seen.update(ctx=ctx, my=my, user=user, roles=roles, baz=baz, prov=prov)
+        seen['app_ctx'] = ctx.app_ctx
+        seen['phase'] = fx_proc.ctx.phase
+        return []
+
+    app_ctx = {'name': 'app'}
+    handler = fx_proc.make_core_handler(
+        core, None, fx_service, [foo_], {shop: shop.fixtures},
+        {'app_ctx': app_ctx, 'staff_ctx': {}}
+    )
+    assert handler.__route__.fixtures == [foo_, baz_, provider]
+    handler()
+    ctx = seen['ctx']
+    assert ctx.user == 'joe'
+    assert ctx.app_ctx is app_ctx and ctx.request is None
+    handler()
+    # bound to its own request
+    assert seen['ctx'] is not ctx
+    assert seen == dict(
+        seen, my='my-ctx', user='joe', roles=(), baz=baz_, prov=provider, phase=ProcessPhase.RUN
+    )
+    # taken on at setup
+    assert fx_proc.ctx.shared_data['baz_ph'][0] == ProcessPhase.SETUP
+
+
+@pytest.mark.parametrize(
+    'how, on_output, foo_bar_baz',
+    [
+        ['return', False, [('foo', False), ('bar', False), ('baz', False)]],
+        ['raise', True, [('foo', False), ('bar', False), ('baz', False)]],
+        ['take_on', False, [('foo', False), ('bar', False), ('baz', False)]],
+        ['take_on', True, [('foo', False), ('bar', False), ('baz', False)]],
+    ],
+    indirect=['foo_bar_baz']
+)
+def test_short_circuit(fx_proc: Proc, foo_bar_baz, shop, fx_service, how, on_output):
+    from omfitt import ShortCircuit
+    foo_, bar_, baz_ = foo_bar_baz
+    sc = ShortCircuit(['redirect'], on_output=on_output)
+    handled = []
+
+    class Stopper(Fixture):
+        def take_on(self, app_ctx, ctx):
+            super().take_on(app_ctx, ctx)
+            raise sc
+
+    def core():
+        if how == 'return':
+            return sc
+        raise sc
+
+    # `after` is not taken on, so its on_output/on_finalize must not be called
+    fixtures = [foo_, bar_] + ([Stopper('stop'), Fixture('after')] if how == 'take_on' else [])
+    handler = fx_proc.make_core_handler(
+        core, None, fx_service, fixtures, {shop: shop.fixtures},
+        {'app_ctx': {}, 'staff_ctx': {}},
+        {'*': lambda app_ctx, ctx, ex: handled.append(ex)}
+    )
+    for _ in range(2):
+        sc.output = ['redirect']
+        res = handler()
+        assert not handled
+        assert sc.__traceback__ is None
+        ctx = fx_proc.ctx
+        assert ctx.successful and ctx.exception is None
+        assert 'after' not in ctx.shared_data
+        if on_output:
+            assert res == ['redirect', 'foo', 'bar'] + (['stop'] if how == 'take_on' else [])
+            assert ctx.shared_data['foo'] == ['touch', 'out', 'final']
+        else:
+            assert res == ['redirect']
+            assert ctx.shared_data['foo'] == ['touch', 'final']
+        assert not fx_service._safe_local.involved
+
+
+@pytest.mark.parametrize(
+    'foo_bar_baz',
+    [[('foo', False), ('bar', False), ('baz', False)]],
+    indirect=['foo_bar_baz']
+)
+def test_ctx_pool(foo_bar_baz, shop, fx_service):
+    foo_, bar_, baz_ = foo_bar_baz
+    proc = Proc(ctx_pool=2)
+    pool = proc._ctx_pool()
+    escaped = []
+
+    def core(keep=False, fail=False, keep_data=False):
+        ctx = proc.ctx
+        assert 'core' not in ctx.shared_data and ctx.ask('k') is None
+        ctx.shared_data['core'] = True
+        ctx.provide('k', 1)
+        keep and escaped.append(ctx)
+        keep_data and escaped.append(ctx.shared_data)
+        if fail:
+            raise KeyError('fail')
+        return ['a']
+
+    handler = proc.make_core_handler(
+        core, None, fx_service, [foo_, bar_], {shop: shop.fixtures},
+        {'app_ctx': {}, 'staff_ctx': {}},
+        {KeyError: lambda app_ctx, ctx, ex: ['handled']}
+    )
+    assert handler() == ['a', 'foo', 'bar']
+    assert len(pool) == 1
+    ctx = pool[0]
+    assert ctx.shared_data == {} and ctx.output is None and ctx.route is None
+    del ctx
+    assert handler() == ['a', 'foo', 'bar']
+    assert len(pool) == 1
+    assert proc.ctx is None
+
+    # stored by user code - not recycled
+    handler(keep=True)
+    assert not pool
+    assert escaped[0].shared_data['core']
+    # the traceback of the handled exception refers to the context
+    assert handler(fail=True) == ['handled']
+    assert not pool
+    handler()
+    assert len(pool) == 1
+    # a container is cleared in place on reuse - not recycled
+    pool.clear()
+    handler(keep_data=True)
+    assert not pool
+    assert escaped[1]['core']
@@ -0,0 +1,111 @@
+import json
+import threading
+from omfitt import BaseFixture, FixtureService, BaseProcessor, FixtureShop, Fitter, BaseApp, ProcessPhase
+from conftest import BaseAction
+from omfitt_profile import CheckoutProfile
+
+
+class Phased(BaseFixture):
+    def __init__(self, name, log):
+        self.name = name
+        self.log = log
+
+    def take_on(self, app_ctx, ctx):
+        self.log.append((self.name, ctx.phase))
+
+
+INDEX = 'make_app.<locals>.index'
+
+
+class App(BaseApp):
+    name = 'app'
+
+
+def make_app(profile, log):
+    conn = Phased('conn', log)
+    db_ = Phased('db', log)
+    db_.use_fixtures(conn)
+    cache_ = Phased('cache', log)
+
+    @FixtureShop.make_from
+    class Shop:
+        db = db_
+        cache = cache_
+
+    proc = BaseProcessor(instruments=[profile])
+    action = BaseAction(Fitter(proc, FixtureService(), [Shop]))
+
+    @action('/index')
+    def index(i):
+        # db is almost always used, cache is rare
+        if i % 10:
+            Shop.db
+        if not i % 5:
+            Shop.cache
+        return i
+
+    action.fitter.freeze_shops()
+    app = App(action)
+    return app, app.mount(), index
+
+
+def test_profile_promotion():
+    log = []
+    profile = CheckoutProfile(threshold=0.5, min_requests=20)
+    app, app_ctx, index = make_app(profile, log)
+    h = app_ctx.handlers[index]
+    for i in range(20):
+        BaseFixture.__init_request_ctx__()
+        h(i)
+    assert set(log) == {('conn', ProcessPhase.RUN), ('db', ProcessPhase.RUN), ('cache', ProcessPhase.RUN)}
+    (requests, checkouts), = profile.collect().values()
+    assert requests == 20
+    assert {f.name: n for f, n in checkouts.items()} == {'conn': 18, 'db': 18, 'cache': 4}
+    assert profile.plans(app_ctx) == {INDEX: ['db']}
+
+    # not attached - nothing is promoted
+    assert h.__route__.fixtures == []
+    profile.attach(app_ctx)
+    # the request path doesn't merge the shards
+    profile.collect = None
+    for i in range(20):
+        BaseFixture.__init_request_ctx__()
+        h(i)
+    assert [f.name for f in h.__route__.fixtures] == ['conn', 'db']
+    log.clear()
+    BaseFixture.__init_request_ctx__()
+    h(1)
+    assert log == [('conn', ProcessPhase.SETUP), ('db', ProcessPhase.SETUP)]
+
+    plans = app.export_plans(app_ctx)
+    assert plans == {INDEX: ['db']}
+
+    # a new worker starts with the learned plans
+    log_ = []
+    app_, app_ctx_, index_ = make_app(CheckoutProfile(), log_)
+    plans = json.loads(json.dumps(plans))
+    assert app_.promote_fixtures(app_ctx_, {**plans, 'gone': ['db'], INDEX: ['db', 'gone']}) == 1
+    assert app_.promote_fixtures(app_ctx_, plans) == 0
+    BaseFixture.__init_request_ctx__()
+    app_ctx_.handlers[index_](5)
+    assert log_ == [('conn', ProcessPhase.SETUP), ('db', ProcessPhase.SETUP), ('cache', ProcessPhase.RUN)]
+    assert app_.export_plans(app_ctx_) == {INDEX: ['db']}
+
+
+def test_profile_thread_per_request():
+    profile = CheckoutProfile(threshold=0.5, min_requests=20)
+    app, app_ctx, index = make_app(profile, [])
+    h = app_ctx.handlers[index]
+
+    def run(i):
+        BaseFixture.__init_request_ctx__()
+        h(i)
+    for i in range(40):
+        t = threading.Thread(target=run, args=(i,))
+        t.start()
+        t.join()
+    assert len(profile._shards) <= 1
+    (requests, checkouts), = profile.collect().values()
+    assert requests == 40
+    assert {f.name: n for f, n in checkouts.items()} == {'conn': 36, 'db': 36, 'cache': 8}
+    assert profile.plans(app_ctx) == {INDEX: ['db']}
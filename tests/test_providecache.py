@@ -0,0 +1,88 @@
+import pytest
+import omfitt_cache
+from omfitt import RouteContext
+from omfitt_cache import ProvideCache, CachedProvider
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(omfitt_cache.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_cache(clock):
+    cache = ProvideCache(maxsize=2, ttl=10, negative_ttl=1, shards=1)
+    calls = []
+
+    def provider(v):
+        return lambda: calls.append(v) or v
+
+    assert cache.get_or_provide('user', 't1', provider('u1')) == 'u1'
+    assert cache.get_or_provide('user', 't1', provider('x')) == 'u1'
+    assert calls == ['u1']
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # ttl
+    clock[0] += 10
+    assert cache.get_or_provide('user', 't1', provider('u1v2')) == 'u1v2'
+
+    # LRU
+    cache.get_or_provide('user', 't2', provider('u2'))
+    cache.get('user', 't1')
+    cache.get_or_provide('user', 't3', provider('u3'))
+    assert cache.get('user', 't2') is None
+    assert cache.get('user', 't1') == 'u1v2'
+
+    # negative caching
+    calls.clear()
+    assert cache.get_or_provide('user', 'bad', provider(None)) is None
+    assert cache.get_or_provide('user', 'bad', provider(None)) is None
+    assert calls == [None]
+    clock[0] += 1
+    cache.get_or_provide('user', 'bad', provider(None))
+    assert calls == [None, None]
+
+    # invalidation
+    cache.set('roles', 't1', {'admin'})
+    cache.invalidate('user', 't1')
+    assert cache.get('user', 't1') is None
+    assert cache.get('roles', 't1') == {'admin'}
+    cache.set('user', 't1', 'u1')
+    cache.invalidate('roles')
+    assert cache.get('roles', 't1') is None
+    assert cache.get('user', 't1') == 'u1'
+    cache.clear()
+    assert cache.get('user', 't1') is None
+
+
+def test_no_negative_caching(clock):
+    cache = ProvideCache()
+    calls = []
+    [cache.get_or_provide('user', 'bad', lambda: calls.append(1)) for _ in range(2)]
+    assert len(calls) == 2
+
+
+def test_cached_provider(clock):
+    loads = []
+
+    def load_user(app_ctx, ctx, token):
+        loads.append(token)
+        return {'token': token}
+
+    user = CachedProvider('user', lambda app_ctx, ctx: ctx.request, load_user)
+
+    def request(token):
+        ctx = RouteContext()
+        ctx.request = token
+        user.take_on({}, ctx)
+        return ctx.ask('user')
+
+    assert request('t1') == {'token': 't1'}
+    assert request('t1') == {'token': 't1'}
+    assert request(None) == {'token': None}
+    assert request(None) == {'token': None}
+    assert loads == ['t1', None, None]
+    user.cache.invalidate('user', 't1')
+    request('t1')
+    assert loads == ['t1', None, None, 't1']
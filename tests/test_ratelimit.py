@@ -0,0 +1,58 @@
+import pytest
+from omfitt import BaseFixture, FixtureService, BaseProcessor
+from omfitt_ratelimit import RateLimitFixture, RateLimited
+
+
+class Expensive(BaseFixture):
+    def __init__(self):
+        self.taken = 0
+
+    def take_on(self, app_ctx, ctx):
+        self.taken += 1
+
+
+def test_reject_before_expensive():
+    limit = RateLimitFixture(rate=0.001, burst=2, key=lambda app_ctx, ctx: ctx.shared_data.get('ip'))
+    expensive = Expensive()
+    expensive.use_fixtures(limit)
+
+    def core():
+        return 'ok'
+    handler = BaseProcessor().make_core_handler(
+        core, None, FixtureService(), [expensive], {},
+        {'app_ctx': {}, 'staff_ctx': {}},
+        {RateLimited: lambda app_ctx, ctx, ex: ex.retry_after}
+    )
+    BaseFixture.__init_request_ctx__()
+    assert [handler(), handler()] == ['ok', 'ok']
+    retry_after = handler()
+    assert retry_after > 900
+    assert expensive.taken == 2
+
+
+def test_refill_and_eviction(monkeypatch):
+    import omfitt_ratelimit
+    now = [100.0]
+    monkeypatch.setattr(omfitt_ratelimit.time, 'monotonic', lambda: now[0])
+    limit = RateLimitFixture(rate=10, burst=1, shards=1, max_keys=2)
+    assert limit.consume('a') == 0
+    assert limit.consume('a') == pytest.approx(0.1)
+    now[0] += 0.11
+    assert limit.consume('a') == 0
+    assert limit.consume('a') > 0
+    limit.consume('b')
+    limit.consume('c')
+    # `a` is evicted as least recently used, so it has a full bucket again
+    assert [*limit._shards[0][1]] == ['b', 'c']
+    assert limit.consume('a') == 0
+
+
+def test_fractional_rate(monkeypatch):
+    import omfitt_ratelimit
+    now = [100.0]
+    monkeypatch.setattr(omfitt_ratelimit.time, 'monotonic', lambda: now[0])
+    limit = RateLimitFixture(rate=0.5)
+    assert limit.consume('a') == 0
+    assert limit.consume('a') == pytest.approx(2)
+    now[0] += 2
+    assert limit.consume('a') == 0
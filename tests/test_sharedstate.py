@@ -0,0 +1,32 @@
+import multiprocessing
+import pytest
+from omfitt_sharedstate import SharedStateFixture
+
+
+def worker(stats, n):
+    for _ in range(n):
+        stats.incr('hits')
+        stats.incr('load', 0.5)
+    stats.set('last', 1.5, 42)
+
+
+@pytest.mark.skipif(
+    'fork' not in multiprocessing.get_all_start_methods(), reason='fork is required'
+)
+def test_shared_between_processes():
+    stats = SharedStateFixture(counters=['hits'], gauges=['load'], records={'last': 'dq'}, stripes=2)
+    mp = multiprocessing.get_context('fork')
+    procs = [mp.Process(target=worker, args=(stats, 500)) for _ in range(4)]
+    [p.start() for p in procs]
+    [p.join() for p in procs]
+    assert stats.snapshot() == {'hits': 2000, 'load': 1000.0, 'last': (1.5, 42)}
+
+
+def test_errors():
+    stats = SharedStateFixture(counters=['hits'], records={'last': 'd'})
+    with pytest.raises(TypeError):
+        stats.set('hits', 1)
+    with pytest.raises(TypeError):
+        stats.incr('last')
+    with pytest.raises(KeyError):
+        SharedStateFixture(counters=['a'], gauges=['a'])
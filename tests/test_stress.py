@@ -0,0 +1,141 @@
+import gc
+import sys
+import threading
+import time
+import tracemalloc
+import omfitt
+import omfitt_load
+from omfitt import BaseFixture, FixtureService, BaseProcessor, FixtureShop, Fitter, BaseApp, BaseAppProp, Provided
+from conftest import BaseAction, Tracked
+
+THREADS = 8
+REQUESTS = 2000
+
+
+class RequestProp(BaseAppProp):
+    def setup(self):
+        return object()
+
+
+class App(BaseApp):
+    name = 'app'
+
+
+def make_app(errors):
+    auth_, db_, cache_ = Tracked('auth'), Tracked('db'), Tracked('cache')
+    db_.use_fixtures(auth_)
+
+    @FixtureShop.make_from
+    class Shop:
+        auth = auth_
+        db = db_
+        cache = cache_
+
+    proc = BaseProcessor()
+    fitter = Fitter(proc, FixtureService(), [Shop])
+    action = BaseAction(fitter)
+
+    @action('/a')
+    @action.uses(db_)
+    def a(i, user=Provided('user')):
+        ctx = proc.ctx
+        ctx.provide('user', i)
+        token = app.token
+        # let other threads interleave
+        time.sleep(0)
+        if app.token is not token or db_._safe_local is not ctx or ctx.ask('user') != i:
+            errors.append(i)
+        return [i]
+
+    @action('/b')
+    @action.uses(auth_)
+    def b(i):
+        ctx = proc.ctx
+        Shop.cache
+        for _ in range(10):
+            Shop.db
+        time.sleep(0)
+        if cache_._safe_local is not ctx or ctx.shared_data['db'] is not ctx:
+            errors.append(i)
+        return [i]
+
+    app = App(action)
+    app.add_prop('token', RequestProp(app))
+    return app
+
+
+def _shared_state(app_ctx):
+    routes = [h.__route__ for h in app_ctx.handlers.values()]
+    fs = routes[0].fixture_service
+    staff_ctx = routes[0].fitter_ctx['staff_ctx']
+    return (
+        {**vars(fs)},
+        {**app_ctx.app.__dict__},
+        {**staff_ctx},
+        {**staff_ctx.get('fixtures_deps_cache', {})},
+        [{**vars(r)} for r in routes],
+    )
+
+
+def test_isolation_and_no_shared_writes():
+    errors = []
+    app = make_app(errors)
+    app_ctx = app.mount()
+    before = _shared_state(app_ctx)
+    outputs = []
+
+    def make_args(h, i):
+        return (i,), {}
+
+    handlers = [*app_ctx.handlers.values()]
+
+    def worker(k):
+        for i in range(k, REQUESTS, THREADS):
+            BaseFixture.__init_request_ctx__()
+            out = handlers[i % 2](i)
+            outputs.append(out)
+            if out != [i]:
+                errors.append(i)
+    pool = [threading.Thread(target=worker, args=(k,)) for k in range(THREADS)]
+    [t.start() for t in pool]
+    [t.join() for t in pool]
+    assert len(outputs) == REQUESTS
+    assert not errors
+    assert _shared_state(app_ctx) == before
+
+
+def _gil_enabled():
+    return getattr(sys, '_is_gil_enabled', lambda: True)()
+
+
+def test_scaling():
+    app_ctx = make_app([]).mount()
+    handlers = [*app_ctx.handlers.values()]
+
+    def make_args(h, i):
+        return (i,), {}
+
+    def run(n):
+        return omfitt_load.run(handlers, threads=n, requests=REQUESTS, make_args=make_args)
+    # warm up lazy caches
+    run(4)
+    before = _shared_state(app_ctx)
+    tracemalloc.start()
+    try:
+        gc.collect()
+        start = tracemalloc.take_snapshot()
+        res = {n: run(n) for n in (1, 4)}
+        gc.collect()
+        end = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    assert not res[1].errors and not res[4].errors
+    assert res[4].contention.deps_cache_writes == 0
+    # the request path writes no shared state and retains nothing per request,
+    # only a few blocks of the last threads' locals may survive
+    assert _shared_state(app_ctx) == before
+    only_core = [tracemalloc.Filter(True, omfitt.__file__)]
+    retained = end.filter_traces(only_core).compare_to(start.filter_traces(only_core), 'lineno')
+    assert sum(max(0, d.count_diff) for d in retained) < 50
+    if not _gil_enabled():
+        assert res[4].throughput / res[1].throughput > 1.5
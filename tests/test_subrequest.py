@@ -0,0 +1,99 @@
+from omfitt import BaseFixture, FixtureService, BaseProcessor, FixtureShop, Fitter, BaseApp, Ctx
+from conftest import BaseAction, Tracked
+
+
+class App(BaseApp):
+    def __init__(self, name, action):
+        self.name = name
+        super().__init__(action)
+
+
+def test_subrequest():
+    log = []
+    db = db_ = Tracked('db', log)
+    cache = cache_ = Tracked('cache', log)
+
+    @FixtureShop.make_from
+    class Shop:
+        db = db_
+        cache = cache_
+
+    @FixtureShop.make_from
+    class ApiShop:
+        db = db_
+        cache = cache_
+
+    api_proc = BaseProcessor()
+    api_action = BaseAction(Fitter(api_proc, FixtureService(), [ApiShop]))
+
+    @api_action('/items')
+    @api_action.uses(db, cache)
+    def api_items(n):
+        api_proc.ctx.provide('seen', api_proc.ctx.ask('user'))
+        return [f'item{i}' for i in range(n)]
+
+    @api_action('/lazy')
+    def api_lazy():
+        return ApiShop.cache.name
+
+    proc = BaseProcessor()
+    action = BaseAction(Fitter(proc, FixtureService(), [Shop]))
+
+    @action('/index')
+    @action.uses(db)
+    def index():
+        proc.ctx.provide('user', 'bob')
+        items = app.subrequest('api', api_items, 2)
+        assert proc.ctx.ask('seen') is None
+        log.append('parent continues')
+        return {'items': items, 'lazy': app.subrequest('api', api_lazy), 'db': Shop.db.name}
+
+    app = App('main', action)
+    api = App('api', api_action)
+    app_ctx = app.mount()
+    api.mount('api', app_ctx)
+
+    BaseFixture.__init_request_ctx__()
+    assert app_ctx.handlers[index]() == {'items': ['item0', 'item1'], 'lazy': 'cache', 'db': 'db'}
+    assert log == [
+        'take_on db',
+        'take_on cache',
+        'on_output cache',
+        'finalize cache',
+        'parent continues',
+        'take_on cache',
+        'on_output cache',
+        'finalize cache',
+        'on_output db',
+        'finalize db',
+    ]
+
+    # outside of a request: the finished one is not a parent
+    assert BaseFixture.__request_master_ctx__.request_ctx.get(BaseProcessor) is None
+    log.clear()
+    h = app_ctx.children['api'].handlers[api_items]
+    assert h.subrequest(1) == ['item0']
+    assert log == ['take_on db', 'take_on cache', 'on_output cache', 'on_output db', 'finalize cache', 'finalize db']
+
+
+def test_subrequest_reusable_app():
+    client_action = BaseAction(Fitter(BaseProcessor(), FixtureService(), []))
+
+    @client_action('/where')
+    def where(ctx=Ctx()):
+        return ctx.app_ctx.name
+
+    proc = BaseProcessor()
+    action = BaseAction(Fitter(proc, FixtureService(), []))
+
+    @action('/index')
+    def index():
+        return [app.subrequest(name, where) for name in ['first', 'second', 'first']]
+
+    app = App('main', action)
+    client = App('client', client_action)
+    app_ctx = app.mount()
+    client.mount('first', app_ctx)
+    client.mount('second', app_ctx)
+    BaseFixture.__init_request_ctx__()
+    assert app_ctx.handlers[index]() == ['first', 'second', 'first']
@@ -0,0 +1,129 @@
+import threading
+import pytest
+from omfitt import BaseFixture, FixtureService, BaseProcessor, FixtureShop, FixtureHolder, Fitter, BaseApp
+from conftest import BaseAction
+
+
+class DB(BaseFixture):
+    def __init__(self, name):
+        self.name = name
+        self.taken = 0
+
+    def take_on(self, app_ctx, ctx):
+        self.taken += 1
+
+
+class Auth(BaseFixture):
+    pass
+
+
+class App(BaseApp):
+    name = 'app'
+
+
+def test_swap():
+    db_holder = FixtureHolder(DB('v1'))
+    db_v1 = db_holder.value
+    auth = Auth()
+    auth.use_fixtures(db_holder)
+
+    @FixtureShop.make_from
+    class Shop:
+        db = db_holder
+        other = DB('other')
+
+    fitter = Fitter(BaseProcessor(), FixtureService(), [Shop])
+    action = BaseAction(fitter)
+    gate = threading.Event()
+
+    @action('/auth')
+    @action.uses(auth)
+    def core(wait=False):
+        db = Shop.db
+        wait and gate.wait(5)
+        return [db.name, Shop.db.name]
+
+    @action('/plain')
+    def plain():
+        return Shop.other.name
+
+    app = App(action)
+    app_ctx = app.mount()
+    h = app_ctx.handlers[core]
+    h_plain = app_ctx.handlers[plain]
+    BaseFixture.__init_request_ctx__()
+    assert h() == ['v1', 'v1']
+    plain_fixtures = h_plain.__route__.fixtures
+
+    results = []
+
+    def in_flight():
+        BaseFixture.__init_request_ctx__()
+        results.append(h(True))
+    t = threading.Thread(target=in_flight)
+    t.start()
+    db_v2 = DB('v2')
+    assert app.swap_fixtures(app_ctx, db=db_v2) == 1
+    assert h() == ['v2', 'v2']
+    gate.set()
+    t.join()
+    assert results == [['v1', 'v1']]
+
+    assert h.__route__.fixtures == [db_v2, auth]
+    assert h_plain.__route__.fixtures is plain_fixtures
+    assert h_plain.__route__.version == 1
+    assert db_v2.taken == 1
+    assert db_v1.taken == 2
+
+    db_v3 = DB('v3')
+    assert app.swap_fixtures(app_ctx, db=db_v3) == 2
+    assert h() == ['v3', 'v3']
+    assert h.__route__.fixtures == [db_v3, auth]
+
+    with pytest.raises(TypeError):
+        app.swap_fixtures(app_ctx, other=DB('x'))
+    with pytest.raises(AttributeError):
+        app.swap_fixtures(app_ctx, nope=DB('x'))
+
+
+def test_swap_checkout_after_swap():
+    db_holder = FixtureHolder(DB('v1'))
+    db_v1 = db_holder.value
+
+    @FixtureShop.make_from
+    class Shop:
+        db = db_holder
+
+    fitter = Fitter(BaseProcessor(), FixtureService(), [Shop])
+    action = BaseAction(fitter)
+    started, gate = threading.Event(), threading.Event()
+
+    @action('/lazy')
+    @action.uses(DB('other'))
+    def core(wait=False):
+        if wait:
+            started.set()
+            gate.wait(5)
+        # lazy checkout after the swap
+        return Shop.db.name
+
+    app = App(action)
+    app_ctx = app.mount()
+    h = app_ctx.handlers[core]
+    results = []
+
+    def in_flight():
+        BaseFixture.__init_request_ctx__()
+        results.append(h(True))
+    t = threading.Thread(target=in_flight)
+    t.start()
+    started.wait(5)
+    db_v2 = DB('v2')
+    app.swap_fixtures(app_ctx, db=db_v2)
+    gate.set()
+    t.join()
+    assert results == ['v1']
+    assert (db_v1.taken, db_v2.taken) == (1, 0)
+    BaseFixture.__init_request_ctx__()
+    assert h() == 'v2'
+    assert (db_v1.taken, db_v2.taken) == (1, 1)
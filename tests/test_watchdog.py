@@ -0,0 +1,75 @@
+import threading
+import time
+from omfitt import BaseFixture, FixtureService, BaseProcessor, ProcessPhase
+from omfitt_watchdog import Watchdog
+
+
+class Stuck(BaseFixture):
+    def __init__(self):
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def take_on(self, app_ctx, ctx):
+        self.entered.set()
+        self.release.wait(5)
+
+
+def test_slow_request_report():
+    reports = []
+    watchdog = Watchdog(threshold=0.05, max_reports=1, on_slow=reports.append, autostart=False)
+    stuck = Stuck()
+    proc = BaseProcessor(instruments=[watchdog])
+
+    def core():
+        return 'ok'
+    handler = proc.make_core_handler(
+        core, None, FixtureService(), [stuck], {}, {'app_ctx': {}, 'staff_ctx': {}}
+    )
+
+    def run():
+        BaseFixture.__init_request_ctx__()
+        handler()
+    threads = [threading.Thread(target=run) for _ in range(2)]
+    [t.start() for t in threads]
+    stuck.entered.wait(5)
+    assert watchdog.check() == []
+    time.sleep(0.1)
+    new = watchdog.check()
+    # rate-limited
+    assert len(new) == 1
+    assert watchdog.check() == []
+    stuck.release.set()
+    [t.join() for t in threads]
+
+    assert reports == new
+    report = reports[0]
+    assert report.fixture is stuck
+    assert report.hook == 'take_on'
+    assert report.phase == ProcessPhase.SETUP
+    assert report.route.name == 'test_slow_request_report.<locals>.core'
+    assert report.elapsed >= 0.05
+    assert 'self.release.wait' in report.stack
+    assert not watchdog._in_flight
+
+
+def test_stop():
+    watchdog = Watchdog(interval=0.01)
+    proc = BaseProcessor(instruments=[watchdog])
+
+    def core():
+        return 'ok'
+    handler = proc.make_core_handler(
+        core, None, FixtureService(), [], {}, {'app_ctx': {}, 'staff_ctx': {}}
+    )
+    BaseFixture.__init_request_ctx__()
+    handler()
+    thread = watchdog._thread
+    assert thread.is_alive()
+    watchdog.stop()
+    assert not thread.is_alive()
+    # no autostart after stop()
+    handler()
+    assert watchdog._thread is None
+    watchdog.start()
+    assert watchdog._thread.is_alive() and watchdog._thread is not thread
+    watchdog.stop()